@@ -23,6 +23,9 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
     app.config["MAX_CONTENT_LENGTH"] = 5 * 1024 * 1024
 
+    from app.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
     db.init_app(app)
     migrate.init_app(app, db)
     login.init_app(app)
@@ -43,6 +46,11 @@ def create_app(config_class=Config):
     from app.auth import auth
     app.register_blueprint(auth)
 
+    # ── Commandes CLI ─────────────────────────────────────────
+    from app.commands import carbs_cli, ciqual_cli
+    app.cli.add_command(carbs_cli)
+    app.cli.add_command(ciqual_cli)
+
     # ── User loader ───────────────────────────────────────────
     from app import models
 
@@ -55,12 +63,8 @@ def create_app(config_class=Config):
     def inject_categories():
         def get_all_categories():
             try:
-                from flask_login import current_user
-                from app.models import Category
-                if current_user.is_authenticated:
-                    return Category.query.filter_by(
-                        user_id=current_user.id).order_by(Category.name).all()
-                return []
+                from app.utils.reference_data import get_user_categories
+                return get_user_categories()
             except Exception as e:
                 logger.error(f"Erreur context processor: {e}")
                 return []
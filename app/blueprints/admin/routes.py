@@ -3,6 +3,11 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import Recipe, Category, Ingredient, Step, Tag
 from app.utils.helpers import safe_str
+from app.utils.carbs import fill_carb_breakdown
+from app.utils.recipe_search import refresh_search_document
+from app.utils.facets import invalidate_facets
+from app.utils.serializers import recipe_payloads
+from app.utils.reference_data import get_user_categories, get_user_category_names, invalidate_user_categories
 from datetime import datetime
 import json
 import io
@@ -20,13 +25,12 @@ logger = logging.getLogger(__name__)
 def dashboard():
     stats = {
         'total_recipes': Recipe.query.filter_by(user_id=current_user.id).count(),
-        'total_categories': Category.query.filter_by(user_id=current_user.id).count(),
+        'total_categories': len(get_user_categories()),
         'total_tags': Tag.query.filter_by(user_id=current_user.id).count(),
         'total_favorites': Recipe.query.filter_by(
             user_id=current_user.id, is_favorite=True).count(),
     }
-    categories = Category.query.filter_by(
-        user_id=current_user.id).order_by(Category.name).all()
+    categories = get_user_categories()
     return render_template('admin/dashboard.html', stats=stats, categories=categories)
 
 
@@ -40,12 +44,13 @@ def add_category():
     if len(name) > 100:
         return jsonify({'success': False, 'message': 'Nom trop long (max 100 caractères).'})
 
-    if Category.query.filter_by(name=name, user_id=current_user.id).first():
+    if name in get_user_category_names():
         return jsonify({'success': False, 'message': 'Cette famille existe déjà.'})
 
     try:
         cat = Category(name=name, user_id=current_user.id)
         db.session.add(cat)
+        invalidate_user_categories()
         db.session.commit()
         return jsonify({'success': True, 'message': f'Famille "{name}" ajoutée !',
                         'category': {'id': cat.id, 'name': cat.name}})
@@ -68,7 +73,9 @@ def delete_category(id):
 
     try:
         db.session.delete(cat)
+        invalidate_user_categories()
         db.session.commit()
+        invalidate_facets(current_user.id)
         msg = f'Famille "{cat_name}" supprimée.'
         if orphan_recipes:
             msg += f' {len(orphan_recipes)} recette(s) déplacée(s) vers "Autre".'
@@ -90,7 +97,7 @@ def edit_category(id):
         return jsonify({'success': False, 'message': 'Nouveau nom invalide ou identique.'})
     if len(new_name) > 100:
         return jsonify({'success': False, 'message': 'Nom trop long.'})
-    if Category.query.filter_by(name=new_name, user_id=current_user.id).first():
+    if new_name in get_user_category_names():
         return jsonify({'success': False, 'message': 'Ce nom existe déjà.'})
 
     try:
@@ -98,7 +105,9 @@ def edit_category(id):
         cat.name = new_name
         for recipe in Recipe.query.filter_by(category=old_name, user_id=current_user.id).all():
             recipe.category = new_name
+        invalidate_user_categories()
         db.session.commit()
+        invalidate_facets(current_user.id)
         return jsonify({'success': True,
                         'message': f'Famille renommée en "{new_name}".',
                         'category': {'id': cat.id, 'name': new_name}})
@@ -113,11 +122,13 @@ def edit_category(id):
 def init_categories():
     defaults = ['Pâtisserie', 'Viennoiserie', 'Confiserie', 'Dessert Glacé',
                 'Gâteau', 'Tarte', 'Boisson', 'Autre']
+    existing = set(get_user_category_names())
     count = 0
     for name in defaults:
-        if not Category.query.filter_by(name=name, user_id=current_user.id).first():
+        if name not in existing:
             db.session.add(Category(name=name, user_id=current_user.id))
             count += 1
+    invalidate_user_categories()
     try:
         db.session.commit()
         flash(f'{count} catégories ajoutées.' if count else 'Catégories déjà présentes.', 'info')
@@ -131,10 +142,9 @@ def init_categories():
 @admin_bp.route('/export')
 @login_required
 def export_data():
-    recipes = Recipe.query.filter_by(user_id=current_user.id).all()
-    data = [r.to_dict() for r in recipes]
+    data = recipe_payloads(Recipe.user_id == current_user.id)
     mem_file = io.BytesIO()
-    mem_file.write(json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8'))
+    mem_file.write(current_app.json.dumps_bytes(data, indent=True))
     mem_file.seek(0)
     return send_file(mem_file, mimetype='application/json', as_attachment=True,
                      download_name=f'backup_{datetime.now().strftime("%Y%m%d")}.json')
@@ -156,6 +166,7 @@ def import_data():
             return redirect(url_for('admin.dashboard'))
 
         count = 0
+        ingredients = []
         for item in data:
             if not isinstance(item, dict) or 'title' not in item:
                 continue
@@ -178,9 +189,10 @@ def import_data():
 
                 for ing_data in item.get('ingredients', []):
                     if isinstance(ing_data, dict) and 'name' in ing_data:
-                        db.session.add(Ingredient(
+                        ingredients.append(Ingredient(
                             recipe_id=recipe.id, name=ing_data['name'],
                             quantity=ing_data.get('quantity'), unit=ing_data.get('unit', 'g')))
+                        db.session.add(ingredients[-1])
 
                 for step_data in item.get('steps', []):
                     if isinstance(step_data, dict) and 'instruction' in step_data:
@@ -188,9 +200,12 @@ def import_data():
                             recipe_id=recipe.id, order=step_data.get('order', 1),
                             instruction=step_data['instruction'],
                             duration=step_data.get('duration')))
+                refresh_search_document(recipe)
                 count += 1
 
+        fill_carb_breakdown(ingredients)
         db.session.commit()
+        invalidate_facets(current_user.id)
         flash(f'{count} recettes importées.', 'success')
 
     except json.JSONDecodeError:
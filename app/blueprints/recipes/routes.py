@@ -1,15 +1,25 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, \
+    stream_with_context, make_response, session
 from flask_login import login_required, current_user
-from sqlalchemy import func, case
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import joinedload, load_only, selectinload
 from app import db
-from app.models import Recipe, Ingredient, Step, Category, Tag, CookingHistory, CiqualFood
+from app.models import Recipe, Ingredient, Step, Tag, CookingHistory, recipe_tags
 from app.forms import RecipeForm
 from app.utils.helpers import save_image, safe_int, safe_float, safe_str
 from mistralai import Mistral
-from app.utils.nutrition_conversion import convert_to_grams
-from app.utils.ciqual_matching import find_best_ciqual_match
+from app.utils.ciqual_matching import get_ciqual_index, get_ciqual_store
+from app.utils.carbs import compute_carb_breakdown, fill_carb_breakdown, STATUS_OK, BREAKDOWN_FIELDS
+from app.utils.recipe_search import apply_search, refresh_search_document
+from app.utils.pagination import keyset_paginate, encode_cursor, decode_cursor
+from app.utils.facets import get_facets, invalidate_facets, carb_range_filter
+from app.utils.reference_data import get_user_categories, get_user_category_names, get_or_create_tag
+from app.utils.http_cache import recipe_etag, not_modified, with_validators
+from app.utils.serializers import recipe_payloads, owned_recipe_payloads
+from datetime import datetime
 import os
 import random
+import time
 import logging
 import json
 
@@ -22,12 +32,14 @@ logger = logging.getLogger(__name__)
 @recipes_bp.route('/')
 @login_required
 def index():
-    page = request.args.get('page', 1, type=int)
+    after = request.args.get('after')
+    before = request.args.get('before')
     category = request.args.get('category', '')
     search = request.args.get('search', '')
     difficulty = request.args.get('difficulty', '')
     max_time = request.args.get('max_time', type=int)
-    sort = request.args.get('sort', 'date_desc')
+    carbs = request.args.get('carbs', '')
+    sort = request.args.get('sort', 'relevance' if search else 'date_desc')
     tag = request.args.get('tag', '')
 
     query = Recipe.query.filter_by(user_id=current_user.id)
@@ -37,47 +49,54 @@ def index():
     elif category:
         query = query.filter(Recipe.category == category)
 
+    relevance = None
     if search:
-        query = query.filter(
-            db.or_(
-                Recipe.title.ilike(f'%{search}%'),
-                Recipe.tags.any(Tag.name.ilike(f'%{search}%'))
-            )
-        )
+        query, relevance = apply_search(query, search)
 
     if difficulty:
         query = query.filter(Recipe.difficulty == difficulty)
 
     if max_time:
-        query = query.filter(
-            (func.coalesce(Recipe.prep_time, 0) + func.coalesce(Recipe.cook_time, 0)) <= max_time
-        )
+        query = query.filter(Recipe.total_time <= max_time)
+
+    carb_filter = carb_range_filter(carbs)
+    if carb_filter is not None:
+        query = query.filter(carb_filter)
 
     if tag:
         query = query.filter(Recipe.tags.any(Tag.name == tag))
 
-    if sort == 'alpha_asc':
-        query = query.order_by(Recipe.title.asc())
+    # Clés de pagination par curseur : le tri actif puis l'id pour départager
+    if sort == 'relevance' and relevance is not None:
+        sort_keys = [(relevance, True), (Recipe.id, True)]
+    elif sort == 'alpha_asc':
+        sort_keys = [(Recipe.title, False), (Recipe.id, False)]
     elif sort == 'time_asc':
-        query = query.order_by(
-            (func.coalesce(Recipe.prep_time, 0) + func.coalesce(Recipe.cook_time, 0)).asc())
+        sort_keys = [(Recipe.total_time, False), (Recipe.id, False)]
+    elif sort == 'carbs_asc':
+        sort_keys = [(Recipe.carbs_per_serving, False), (Recipe.id, False)]
+    elif sort == 'carbs_desc':
+        sort_keys = [(Recipe.carbs_per_serving, True), (Recipe.id, True)]
     elif sort == 'difficulty_asc':
         difficulty_order = case(
             {'Facile': 1, 'Moyen': 2, 'Difficile': 3},
             value=Recipe.difficulty, else_=4
         )
-        query = query.order_by(difficulty_order.asc())
+        sort_keys = [(difficulty_order, False), (Recipe.id, False)]
     elif sort == 'date_asc':
-        query = query.order_by(Recipe.created_at.asc())
+        sort_keys = [(Recipe.created_at, False), (Recipe.id, False)]
     else:
-        query = query.order_by(Recipe.created_at.desc())
-
-    recipes = query.paginate(page=page, per_page=9, error_out=False)
-    categories = [c.name for c in Category.query.filter_by(
-        user_id=current_user.id).order_by(Category.name).all()]
-    available_tags = Tag.query.filter_by(user_id=current_user.id)\
-        .join(Tag.recipes).filter(Recipe.user_id == current_user.id)\
-        .distinct().order_by(Tag.name).all()
+        sort_keys = [(Recipe.created_at, True), (Recipe.id, True)]
+
+    # Le total (estimé) n'est calculé que pour la première page
+    recipes = keyset_paginate(query, sort_keys, sort, per_page=9, after=after, before=before,
+                              with_count=not (after or before))
+    filter_args = {k: v for k, v in (('category', category), ('search', search),
+                                     ('difficulty', difficulty), ('max_time', max_time),
+                                     ('carbs', carbs if carb_filter is not None else ''),
+                                     ('sort', sort), ('tag', tag)) if v}
+    categories = get_user_category_names()
+    facets = get_facets(current_user.id)
 
     return render_template('index.html',
                            recipes=recipes,
@@ -86,9 +105,11 @@ def index():
                            search=search,
                            current_difficulty=difficulty,
                            current_max_time=max_time,
+                           current_carbs=carbs,
                            current_sort=sort,
                            current_tag=tag,
-                           available_tags=available_tags)
+                           filter_args=filter_args,
+                           facets=facets)
 
 
 # ── DETAIL ───────────────────────────────────────────────────
@@ -100,16 +121,40 @@ def recipe_detail(id):
         flash("Vous n'avez pas accès à cette recette.", 'danger')
         return redirect(url_for('recipes.index'))
 
-    similar_recipes = []
-    if recipe.tags:
-        tag_ids = [t.id for t in recipe.tags]
-        similar_recipes = Recipe.query.filter(
+    # Recettes partageant un tag, choisies sans charger recipe.tags
+    similar = db.session.execute(
+        select(Recipe.id, Recipe.updated_at).where(
             Recipe.user_id == current_user.id,
             Recipe.id != recipe.id,
-            Recipe.tags.any(Tag.id.in_(tag_ids))
-        ).order_by(Recipe.created_at.desc()).limit(3).all()
+            Recipe.tags.any(Tag.id.in_(
+                select(recipe_tags.c.tag_id).where(recipe_tags.c.recipe_id == recipe.id))))
+        .order_by(Recipe.created_at.desc()).limit(3)).all()
+
+    # La page dépend aussi du menu des familles, des recettes similaires et
+    # du jeton CSRF de la session (valide WTF_CSRF_TIME_LIMIT secondes) :
+    # l'ETag, faible, change au plus tard à mi-vie du jeton
+    csrf_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    etag = recipe_etag(recipe, current_user.id, current_user.username, get_user_category_names(),
+                       tuple(similar), session.get('csrf_token'),
+                       int(time.time() // (csrf_limit / 2)) if csrf_limit else 0)
+    last_modified = max(filter(None, [recipe.updated_at] + [row.updated_at for row in similar]), default=None)
+    # Un message flash en attente doit être affiché : pas de 304 ni d'ETag
+    pending_flash = '_flashes' in session
+    if not pending_flash:
+        cached = not_modified(etag, weak=True)
+        if cached:
+            return cached
+
+    similar_recipes = []
+    if similar:
+        similar_recipes = Recipe.query.filter(Recipe.id.in_([row.id for row in similar]))\
+            .options(selectinload(Recipe.tags)).order_by(Recipe.created_at.desc()).all()
 
-    return render_template('recipe_detail.html', recipe=recipe, similar_recipes=similar_recipes)
+    response = make_response(render_template('recipe_detail.html', recipe=recipe,
+                                             similar_recipes=similar_recipes))
+    if pending_flash:
+        return response
+    return with_validators(response, etag, last_modified, weak=True)
 
 
 # ── CREATION ─────────────────────────────────────────────────
@@ -149,8 +194,10 @@ def recipe_new():
             _save_ingredients(recipe.id, request.form)
             _save_steps(recipe.id, request.form)
             _save_tags(recipe, request.form.get('tags', ''))
+            refresh_search_document(recipe)
 
             db.session.commit()
+            invalidate_facets(current_user.id)
             flash('Recette créée avec succès !', 'success')
             return redirect(url_for('recipes.recipe_detail', id=recipe.id))
 
@@ -159,8 +206,7 @@ def recipe_new():
             logger.error(f"Erreur création recette: {e}")
             flash(f'Erreur lors de la création : {str(e)}', 'danger')
 
-    categories = [c.name for c in Category.query.filter_by(
-        user_id=current_user.id).order_by(Category.name).all()]
+    categories = get_user_category_names()
     return render_template('recipe_form.html', form=form, recipe=None, categories=categories)
 
 
@@ -174,8 +220,7 @@ def recipe_edit(id):
         return redirect(url_for('recipes.index'))
 
     form = RecipeForm(obj=recipe)
-    categories = [c.name for c in Category.query.filter_by(
-        user_id=current_user.id).order_by(Category.name).all()]
+    categories = get_user_category_names()
 
     if request.method == 'POST':
         try:
@@ -208,13 +253,20 @@ def recipe_edit(id):
                     if filename:
                         recipe.image_filename = filename
 
+            previous = _carb_snapshots(recipe.ingredients)
             Ingredient.query.filter_by(recipe_id=recipe.id).delete()
             Step.query.filter_by(recipe_id=recipe.id).delete()
-            _save_ingredients(recipe.id, request.form)
+            _save_ingredients(recipe.id, request.form, previous)
             _save_steps(recipe.id, request.form)
             _save_tags(recipe, request.form.get('tags', ''))
+            # Les enfants ont été réécrits par requêtes : relire les listes,
+            # et dater la recette même si sa propre ligne est inchangée
+            db.session.expire(recipe, ['ingredients', 'steps'])
+            recipe.updated_at = datetime.utcnow()
+            refresh_search_document(recipe)
 
             db.session.commit()
+            invalidate_facets(current_user.id)
             flash('Recette modifiée avec succès !', 'success')
             return redirect(url_for('recipes.recipe_detail', id=recipe.id))
 
@@ -245,6 +297,7 @@ def recipe_delete(id):
 
     db.session.delete(recipe)
     db.session.commit()
+    invalidate_facets(current_user.id)
     flash('Recette supprimée.', 'success')
     return redirect(url_for('recipes.index'))
 
@@ -273,6 +326,7 @@ def recipes_delete_bulk():
             deleted += 1
 
     db.session.commit()
+    invalidate_facets(current_user.id)
     flash(f'{deleted} recette(s) supprimée(s).', 'success')
     return redirect(url_for('recipes.all_recipes'))
 
@@ -288,6 +342,7 @@ def toggle_favorite(id):
     recipe.is_favorite = not recipe.is_favorite
     try:
         db.session.commit()
+        invalidate_facets(current_user.id)
         return jsonify({
             'success': True,
             'is_favorite': recipe.is_favorite,
@@ -340,7 +395,7 @@ def recipes_by_tag(tag_name):
     recipes = Recipe.query.filter(
         Recipe.user_id == current_user.id,
         Recipe.tags.any(Tag.id == tag.id)
-    ).order_by(Recipe.created_at.desc()).all()
+    ).options(selectinload(Recipe.tags)).order_by(Recipe.created_at.desc()).all()
     return render_template('recipes_by_tag.html', tag=tag, recipes=recipes)
 
 
@@ -364,6 +419,7 @@ def mark_cooked(id):
 @login_required
 def history():
     history_entries = CookingHistory.query.filter_by(user_id=current_user.id)\
+        .options(joinedload(CookingHistory.recipe))\
         .order_by(CookingHistory.cooked_at.desc()).all()
     return render_template('history.html', history=history_entries)
 
@@ -400,30 +456,68 @@ def history_clear():
 @recipes_bp.route('/all-recipes')
 @login_required
 def all_recipes():
-    recipes = Recipe.query.filter_by(user_id=current_user.id).order_by(
-        Recipe.category, Recipe.title).all()
-    categories = Category.query.filter_by(
-        user_id=current_user.id).order_by(Category.name).all()
-
-    recipe_data = []
-    for recipe in recipes:
-        total_time = (recipe.prep_time or 0) + (recipe.cook_time or 0)
-        ingredients_list = [f"{ing.quantity or ''} {ing.unit} {ing.name}".strip()
-                            for ing in recipe.ingredients]
-        recipe_data.append({
-            'id': recipe.id,
-            'title': recipe.title,
-            'category': recipe.category or 'Autre',
-            'image': recipe.image_filename,
-            'ingredients': ingredients_list,
-            'total_time': total_time,
-            'total_carbs': recipe.total_carbs or 0,
-            'servings': recipe.servings or 4,
-            'difficulty': recipe.difficulty or 'Moyen',
-            'rating': recipe.rating
-        })
+    """Coquille de la page : les lignes sont chargées par /api/all-recipes."""
+    return render_template('all_recipes.html',
+                           total=get_facets(current_user.id)['total'],
+                           categories=get_user_categories())
 
-    return render_template('all_recipes.html', recipe_data=recipe_data, categories=categories)
+
+ALL_RECIPES_PAGE_SIZE = 100
+ALL_RECIPES_MAX_PAGE_SIZE = 500
+INGREDIENTS_PREVIEW = 5
+
+
+@recipes_bp.route('/api/all-recipes')
+@login_required
+def api_all_recipes():
+    """Une page du tableau « Toutes mes recettes » : seules les colonnes
+    affichées, plus un aperçu des ingrédients lu en une requête pour la page."""
+    limit = min(max(request.args.get('limit', ALL_RECIPES_PAGE_SIZE, type=int), 1),
+                ALL_RECIPES_MAX_PAGE_SIZE)
+    category = func.coalesce(Recipe.category, 'Autre')
+    stmt = select(Recipe.id, Recipe.title, category.label('category'), Recipe.image_filename,
+                  Recipe.servings, Recipe.difficulty, Recipe.total_time, Recipe.total_carbs,
+                  Recipe.rating).where(Recipe.user_id == current_user.id)
+    page = keyset_paginate(stmt, [(category, False), (Recipe.title, False), (Recipe.id, False)],
+                           'all-recipes', per_page=limit, after=request.args.get('after'))
+
+    ingredients = _ingredient_previews([row.id for row in page.items])
+    return jsonify({
+        'recipes': [{
+            'id': row.id,
+            'title': row.title,
+            'category': row.category,
+            'image': row.image_filename,
+            'servings': row.servings or 4,
+            'difficulty': row.difficulty or 'Moyen',
+            'total_time': row.total_time,
+            'total_carbs': row.total_carbs or 0,
+            'rating': row.rating,
+            **ingredients.get(row.id, {'ingredients': [], 'ingredient_count': 0}),
+        } for row in page.items],
+        'next_cursor': page.next_cursor,
+    })
+
+
+def _ingredient_previews(recipe_ids):
+    """{recipe_id: {'ingredients': [5 premières lignes], 'ingredient_count': n}}"""
+    if not recipe_ids:
+        return {}
+    numbered = select(
+        Ingredient.recipe_id, Ingredient.quantity, Ingredient.unit, Ingredient.name,
+        func.row_number().over(partition_by=Ingredient.recipe_id, order_by=Ingredient.id).label('position'),
+        func.count().over(partition_by=Ingredient.recipe_id).label('total'),
+    ).where(Ingredient.recipe_id.in_(recipe_ids)).subquery()
+    rows = db.session.execute(
+        select(numbered).where(numbered.c.position <= INGREDIENTS_PREVIEW)
+        .order_by(numbered.c.recipe_id, numbered.c.position))
+
+    previews = {}
+    for recipe_id, quantity, unit, name, _, total in rows:
+        preview = previews.setdefault(recipe_id, {'ingredients': [], 'ingredient_count': total})
+        preview['ingredients'].append(' '.join(f'{p:g}' if isinstance(p, float) else p
+                                               for p in (quantity, unit, name) if p))
+    return previews
 
 
 # ── PARTAGE PUBLIC ───────────────────────────────────────────
@@ -450,15 +544,139 @@ def recipe_share(id):
 @recipes_bp.route('/recette/<token>')
 def recipe_public(token):
     recipe = Recipe.query.filter_by(share_token=token).first_or_404()
-    return render_template('recipe_shared.html', recipe=recipe)
+    etag = recipe_etag(recipe)
+    cached = not_modified(etag, recipe.updated_at)
+    if cached:
+        return cached
+    return with_validators(make_response(render_template('recipe_shared.html', recipe=recipe)),
+                           etag, recipe.updated_at, public=True)
 
 
 # ── API ──────────────────────────────────────────────────────
+@recipes_bp.route('/api/facets')
+@login_required
+def api_facets():
+    """Compteurs des filtres de l'index (familles, difficultés, tags,
+    favoris, temps max) de l'utilisateur."""
+    return jsonify(get_facets(current_user.id))
+
+
+API_STREAM_BATCH = 500
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def _requested_fields(names):
+    """Champs demandés à l'API (l'id est toujours renvoyé) et champs inconnus."""
+    fields = {f.strip() for f in names if f.strip()} | {'id'}
+    return fields, fields - set(Recipe.DICT_COLUMNS + Recipe.DICT_RELATIONS)
+
+
 @recipes_bp.route('/api/recipes')
 @login_required
 def api_recipes():
-    recipes = Recipe.query.filter_by(user_id=current_user.id).all()
-    return jsonify([r.to_dict() for r in recipes])
+    """Recettes de l'utilisateur par id croissant.
+
+    ?fields=title,tags   ne renvoie (et ne charge) que ces champs, plus l'id
+    ?limit=N&after=...   page de N recettes, à partir du curseur `after`
+
+    En JSON, le curseur de la page suivante est dans l'en-tête X-Next-Cursor.
+    Avec Accept: application/x-ndjson, une recette par ligne est envoyée au
+    fil de l'eau (curseur serveur, lots de API_STREAM_BATCH) ; si `limit`
+    coupe la liste, une dernière ligne {"next_cursor": ...} la termine."""
+    allowed = Recipe.DICT_COLUMNS + Recipe.DICT_RELATIONS
+    fields = None
+    if request.args.get('fields'):
+        fields, unknown = _requested_fields(request.args['fields'].split(','))
+        if unknown:
+            return jsonify({'error': f"Champs inconnus : {', '.join(sorted(unknown))}"}), 400
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit doit être positif'}), 400
+
+    criteria = [Recipe.user_id == current_user.id]
+    after = request.args.get('after')
+    if after:
+        after_values = decode_cursor(after, 'api-recipes')
+        if after_values is None:
+            return jsonify({'error': 'Curseur invalide'}), 400
+        criteria.append(Recipe.id > after_values[0])
+
+    if request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        wanted = fields if fields is not None else allowed
+        query = Recipe.query.filter(*criteria).order_by(Recipe.id).options(
+            load_only(*(getattr(Recipe, f) for f in Recipe.DICT_COLUMNS if f in wanted)),
+            *(selectinload(getattr(Recipe, r)) for r in Recipe.DICT_RELATIONS if r in wanted))
+        if limit is not None:
+            query = query.limit(limit + 1)
+        return Response(stream_with_context(_ndjson_recipes(query, fields, limit)),
+                        mimetype=NDJSON_MIMETYPE)
+
+    recipes = recipe_payloads(*criteria, fields=fields, limit=limit + 1 if limit is not None else None)
+    has_more = limit is not None and len(recipes) > limit
+    recipes = recipes[:limit]
+    response = jsonify(recipes)
+    if has_more:
+        cursor = encode_cursor('api-recipes', [recipes[-1]['id']])
+        response.headers['X-Next-Cursor'] = cursor
+        response.headers['Link'] = \
+            f'<{url_for("recipes.api_recipes", _external=True, **{**request.args, "after": cursor})}>; rel="next"'
+    return response
+
+
+def _ndjson_recipes(query, fields, limit):
+    """Une ligne JSON par recette ; les objets sont lus par lots et ne
+    restent pas en mémoire une fois écrits."""
+    last_id = None
+    for count, recipe in enumerate(query.yield_per(API_STREAM_BATCH), 1):
+        if limit is not None and count > limit:
+            yield current_app.json.dumps_bytes({'next_cursor': encode_cursor('api-recipes', [last_id])}) + b'\n'
+            break
+        last_id = recipe.id
+        yield current_app.json.dumps_bytes(recipe.to_dict(fields)) + b'\n'
+        db.session.expunge(recipe)
+
+
+API_BATCH_MAX = 100
+
+
+@recipes_bp.route('/api/recipes/batch', methods=['POST'])
+@login_required
+def api_recipes_batch():
+    """Plusieurs recettes en une requête HTTP.
+
+    Corps JSON : {"ids": [3, 7, ...], "fields": ["title", "tags"]} (fields
+    optionnel, comme ?fields= de /api/recipes), au plus API_BATCH_MAX ids.
+    Réponse : {"recipes": [...], "missing": [...], "forbidden": [...]}, les
+    recettes dans l'ordre des ids ; une requête SQL par table quel que soit
+    le nombre d'ids."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Données invalides'}), 400
+
+    recipe_ids = data.get('ids')
+    if not isinstance(recipe_ids, list) or not recipe_ids:
+        return jsonify({'error': 'Aucune recette demandée'}), 400
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in recipe_ids):
+        return jsonify({'error': 'IDs invalides'}), 400
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    if len(recipe_ids) > API_BATCH_MAX:
+        return jsonify({'error': f'Au plus {API_BATCH_MAX} recettes par requête'}), 400
+
+    fields = None
+    if data.get('fields') is not None:
+        if not isinstance(data['fields'], list) or not all(isinstance(f, str) for f in data['fields']):
+            return jsonify({'error': 'fields doit être une liste de noms de champs'}), 400
+        fields, unknown = _requested_fields(data['fields'])
+        if unknown:
+            return jsonify({'error': f"Champs inconnus : {', '.join(sorted(unknown))}"}), 400
+
+    recipes, forbidden = owned_recipe_payloads(recipe_ids, current_user.id, fields)
+    found = {r['id'] for r in recipes} | set(forbidden)
+    return jsonify({
+        'recipes': recipes,
+        'missing': [i for i in recipe_ids if i not in found],
+        'forbidden': forbidden,
+    })
 
 
 @recipes_bp.route('/api/recipe/<int:id>')
@@ -467,7 +685,11 @@ def api_recipe(id):
     recipe = db.get_or_404(Recipe, id)
     if recipe.user_id != current_user.id:
         return jsonify({'error': 'Accès non autorisé'}), 403
-    return jsonify(recipe.to_dict())
+    etag = recipe_etag(recipe)
+    cached = not_modified(etag, recipe.updated_at)
+    if cached:
+        return cached
+    return with_validators(jsonify(recipe.to_dict()), etag, recipe.updated_at)
 
 
 # ── PING ─────────────────────────────────────────────────────
@@ -477,10 +699,41 @@ def ping():
 
 
 # ── HELPERS INTERNES ─────────────────────────────────────────
-def _save_ingredients(recipe_id, form):
+def _ingredient_key(name, quantity, unit, manual_weight_g):
+    return (name, quantity, (unit or '').strip(), manual_weight_g)
+
+
+def _carb_snapshots(ingredients):
+    """Détail de glucides des ingrédients existants, par contenu de ligne."""
+    return {
+        _ingredient_key(ing.name, ing.quantity, ing.unit, ing.manual_weight_g):
+            dict({f: getattr(ing, f) for f in BREAKDOWN_FIELDS},
+                 ciqual_version=ing.ciqual_version)
+        for ing in ingredients if ing.carb_status is not None
+    }
+
+
+def _manual_weights(form):
+    """Poids saisis à la main lors du calcul auto : {(nom, unité): grammes}."""
+    try:
+        entries = json.loads(form.get('carbs_manual_weights') or '[]')
+        return {(str(e['name']).strip(), str(e.get('unit') or '').strip()): float(e['weight_g'])
+                for e in entries}
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return {}
+
+
+def _save_ingredients(recipe_id, form, previous=None):
+    """Enregistre les ingrédients avec leur détail de glucides. Les lignes
+    identiques à une ligne de `previous` (même version CIQUAL) reprennent
+    leur détail ; seules les autres sont recalculées, en un seul lot."""
     names = form.getlist('ingredient_name[]')
     quantities = form.getlist('ingredient_quantity[]')
     units = form.getlist('ingredient_unit[]')
+    manual_weights = _manual_weights(form)
+    previous = previous or {}
+    version = get_ciqual_index().version
+    to_compute = []
     for i, name in enumerate(names):
         if name.strip():
             qty = None
@@ -490,8 +743,20 @@ def _save_ingredients(recipe_id, form):
                 except ValueError:
                     qty = None
             unit = units[i] if i < len(units) else 'g'
-            db.session.add(Ingredient(
-                recipe_id=recipe_id, name=name.strip(), quantity=qty, unit=unit))
+            ingredient = Ingredient(
+                recipe_id=recipe_id, name=name.strip(), quantity=qty, unit=unit,
+                manual_weight_g=manual_weights.get((name.strip(), (unit or '').strip())))
+            db.session.add(ingredient)
+
+            snapshot = previous.get(_ingredient_key(
+                ingredient.name, qty, unit, ingredient.manual_weight_g))
+            if snapshot and snapshot['ciqual_version'] == version:
+                for field, value in snapshot.items():
+                    setattr(ingredient, field, value)
+            else:
+                to_compute.append(ingredient)
+
+    fill_carb_breakdown(to_compute)
 
 
 def _save_steps(recipe_id, form):
@@ -511,34 +776,48 @@ def _save_steps(recipe_id, form):
 
 
 def _save_tags(recipe, tags_input):
-    from flask_login import current_user
     recipe.tags = []
     if tags_input:
         tag_names = list(set([t.strip() for t in tags_input.split(',') if t.strip()]))
         for tag_name in tag_names:
-            tag = Tag.query.filter_by(name=tag_name, user_id=current_user.id).first()
-            if not tag:
-                tag = Tag(name=tag_name, user_id=current_user.id)
-                db.session.add(tag)
-            recipe.tags.append(tag)
+            recipe.tags.append(get_or_create_tag(tag_name))
 
 @recipes_bp.route('/api/foods/search', methods=['GET'])
 def search_foods():
-    """Recherche d'aliments dans la base CIQUAL"""
+    """Autocomplétion des aliments CIQUAL (index en mémoire, sans accents).
+    Le résultat ne dépend que de la requête et de la version du jeu CIQUAL,
+    d'où un ETag par version et un cache HTTP public."""
     query = request.args.get('q', '').strip()
-    if len(query) < 2:
-        return jsonify([])
-    
-    # Recherche dans la base de données
-    foods = CiqualFood.query.filter(
-        CiqualFood.name.ilike(f'%{query}%')
-    ).limit(20).all()
-    
-    return jsonify([{
+    index = get_ciqual_index()
+    foods = index.autocomplete(query[:100]) if len(query) >= 2 else ()
+
+    response = jsonify([{
         'id': food.id,
         'name': food.name,
         'carbs_per_100g': food.carbs_per_100g
     } for food in foods])
+    response.set_etag(f'ciqual-v{index.version or 0}')
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
+
+@recipes_bp.route('/api/foods/<int:food_id>/nutrients', methods=['GET'])
+def food_nutrients(food_id):
+    """Composition complète (pour 100 g) d'un aliment CIQUAL, lue dans le
+    stockage mmap partagé par les workers."""
+    store = get_ciqual_store()
+    if store is None:
+        return jsonify({'success': False, 'message': 'Données nutritionnelles indisponibles'}), 503
+    nutrients = store.nutrients(food_id)
+    if nutrients is None:
+        return jsonify({'success': False, 'message': 'Aliment introuvable'}), 404
+
+    response = jsonify({'id': food_id, 'name': store.name(store.position(food_id)),
+                        'nutrients': nutrients})
+    response.set_etag(f'ciqual-v{store.version or 0}-{food_id}')
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
 
 @recipes_bp.route('/api/calculate-carbs', methods=['POST'])
 @login_required
@@ -554,6 +833,7 @@ def calculate_carbs():
         total_carbs = 0.0
         unresolved = []
 
+        parsed = []
         for ing in ingredients:
             name = (ing.get('name') or '').strip()
             unit = (ing.get('unit') or '').strip()
@@ -565,39 +845,34 @@ def calculate_carbs():
             if not name or qty <= 0:
                 continue
 
-            manual_weight = ing.get('manual_weight_g')
-            if manual_weight is not None:
-                try:
-                    weight_g = float(manual_weight)
-                except (TypeError, ValueError):
-                    weight_g = None
-            else:
-                weight_g = convert_to_grams(name, qty, unit)
+            parsed.append((name, qty, unit, ing.get('manual_weight_g')))
+
+        breakdown, _ = compute_carb_breakdown(parsed)
+        # Enregistre les nouvelles correspondances CIQUAL (cache ingredient_matches)
+        db.session.commit()
 
-            if weight_g is None:
+        for (name, qty, unit, _), entry in zip(parsed, breakdown):
+            if entry['carb_status'] == 'unite_non_convertible':
                 unresolved.append({
                     'name': name, 'qty': qty, 'unit': unit,
-                    'reason': 'unite_non_convertible'
+                    'reason': entry['carb_status']
                 })
                 continue
 
-            food = find_best_ciqual_match(name)
-
-            if not food:
+            if entry['carb_status'] != STATUS_OK:
                 unresolved.append({
                     'name': name, 'qty': qty, 'unit': unit,
-                    'weight_g': round(weight_g, 1),
-                    'reason': 'aliment_non_trouve'
+                    'weight_g': round(entry['weight_g'], 1),
+                    'reason': entry['carb_status']
                 })
                 continue
 
-            carbs = (weight_g * food.carbs_per_100g) / 100.0
-            total_carbs += carbs
+            total_carbs += entry['carbs_g']
             details.append({
                 'ingredient': name,
-                'matched_food': food.name,
-                'weight_g': round(weight_g, 1),
-                'carbs_g': round(carbs, 1)
+                'matched_food': entry['matched_food_name'],
+                'weight_g': round(entry['weight_g'], 1),
+                'carbs_g': round(entry['carbs_g'], 1)
             })
 
         return jsonify({
@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, send_file, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
 from app import db
-from app.models import Recipe, Ingredient, Step, Tag, Category
+from app.models import Recipe, Ingredient, Step, Category
 from app.utils.helpers import safe_int, safe_float, safe_str
+from app.utils.carbs import fill_carb_breakdown
+from app.utils.recipe_search import refresh_search_document
+from app.utils.facets import invalidate_facets
+from app.utils.serializers import recipe_payloads
+from app.utils.reference_data import get_or_create_tag
 from datetime import datetime
 import json
 import io
@@ -58,7 +64,7 @@ def shopping_list():
     recipes = Recipe.query.filter(
         Recipe.id.in_(recipe_ids),
         Recipe.user_id == current_user.id
-    ).all()
+    ).options(selectinload(Recipe.ingredients)).all()
 
     if not recipes:
         flash("Aucune recette valide sélectionnée.", 'warning')
@@ -99,25 +105,17 @@ def export_selected():
     if len(recipe_ids) > 100:
         return jsonify({'error': 'Trop de recettes sélectionnées'}), 400
 
-    recipes = Recipe.query.filter(
-        Recipe.id.in_(recipe_ids),
-        Recipe.user_id == current_user.id
-    ).all()
-
-    export_data = []
-    for recipe in recipes:
-        r_dict = recipe.to_dict()
-        r_dict.pop('id', None)
-        r_dict.pop('is_favorite', None)
+    fields = [f for f in Recipe.DICT_COLUMNS + Recipe.DICT_RELATIONS if f not in ('id', 'is_favorite')]
+    export_data = recipe_payloads(Recipe.id.in_(recipe_ids), Recipe.user_id == current_user.id, fields=fields)
+    for r_dict in export_data:
         r_dict['image_filename'] = None
-        for ing in r_dict.get('ingredients', []):
+        for ing in r_dict['ingredients']:
             ing.pop('id', None)
-        for step in r_dict.get('steps', []):
+        for step in r_dict['steps']:
             step.pop('id', None)
-        export_data.append(r_dict)
 
     mem_file = io.BytesIO()
-    mem_file.write(json.dumps(export_data, ensure_ascii=False, indent=4).encode('utf-8'))
+    mem_file.write(current_app.json.dumps_bytes(export_data, indent=True))
     mem_file.seek(0)
     return send_file(mem_file, mimetype='application/json', as_attachment=True,
                      download_name='recettes_selectionnees.json')
@@ -183,6 +181,7 @@ def finalize_import():
 
     existing_titles = {r.title.lower() for r in Recipe.query.filter_by(user_id=current_user.id).all()}
     imported_count = 0
+    ingredients = []
 
     try:
         for r_data in recipes_to_add:
@@ -208,12 +207,13 @@ def finalize_import():
             db.session.flush()
 
             for ing_data in r_data.get('ingredients', []):
-                db.session.add(Ingredient(
+                ingredients.append(Ingredient(
                     recipe_id=new_recipe.id,
                     name=safe_str(ing_data.get('name', 'Ingrédient inconnu'), 200),
                     quantity=safe_float(ing_data.get('quantity')),
                     unit=safe_str(ing_data.get('unit'), 50)
                 ))
+                db.session.add(ingredients[-1])
 
             for step_data in r_data.get('steps', []):
                 db.session.add(Step(
@@ -226,16 +226,15 @@ def finalize_import():
             for tag_name in r_data.get('tags', []):
                 clean_tag = safe_str(tag_name, 50)
                 if clean_tag:
-                    tag = Tag.query.filter_by(name=clean_tag, user_id=current_user.id).first()
-                    if not tag:
-                        tag = Tag(name=clean_tag, user_id=current_user.id)
-                        db.session.add(tag)
-                    new_recipe.tags.append(tag)
+                    new_recipe.tags.append(get_or_create_tag(clean_tag))
 
+            refresh_search_document(new_recipe)
             imported_count += 1
             existing_titles.add(title.lower())
 
+        fill_carb_breakdown(ingredients)
         db.session.commit()
+        invalidate_facets(current_user.id)
         return jsonify({'message': f'{imported_count} recette(s) importée(s) avec succès !'})
 
     except Exception as e:
@@ -0,0 +1,173 @@
+import os
+import click
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+from app import db
+from app.models import Recipe, Ingredient, CiqualFood
+from app.utils.carbs import init_recompute_worker, recompute_chunk, BREAKDOWN_FIELDS
+from app.utils.ciqual_matching import get_ciqual_index, current_ciqual_version
+from app.utils.ciqual_data import CIQUAL_CSV_PATH
+from app.utils.ciqual_loader import load_ciqual
+from app.utils.ciqual_store import build_ciqual_store
+
+carbs_cli = AppGroup('carbs', help="Maintenance des glucides des recettes.")
+ciqual_cli = AppGroup('ciqual', help="Gestion de la table CIQUAL.")
+
+
+def _recipe_chunks(chunk_size):
+    """Parcourt les recettes par paquets (pagination par id, mémoire constante).
+    Produit (paquet à calculer, {recipe_id: (titre, ancien total)})."""
+    last_id = 0
+    while True:
+        recipes = db.session.execute(
+            select(Recipe.id, Recipe.title, Recipe.total_carbs)
+            .where(Recipe.id > last_id).order_by(Recipe.id).limit(chunk_size)
+        ).all()
+        if not recipes:
+            return
+        last_id = recipes[-1].id
+
+        ingredients = {r.id: [] for r in recipes}
+        for ing in db.session.execute(
+            select(Ingredient.id, Ingredient.recipe_id, Ingredient.name, Ingredient.quantity,
+                   Ingredient.unit, Ingredient.manual_weight_g)
+            .where(Ingredient.recipe_id.in_(ingredients)).order_by(Ingredient.id)
+        ):
+            ingredients[ing.recipe_id].append(
+                (ing.id, ing.name, ing.quantity, ing.unit, ing.manual_weight_g))
+
+        yield (list(ingredients.items()),
+               {r.id: (r.title, r.total_carbs or 0.0) for r in recipes})
+
+
+def _write_back(results, version, dry_run):
+    recipe_rows, ingredient_rows = [], []
+    now = datetime.utcnow()
+    for recipe_id, total, entries in results:
+        # updated_at sert de Last-Modified aux pages de la recette
+        if total is not None:
+            recipe_rows.append({'id': recipe_id, 'total_carbs': total, 'updated_at': now})
+        else:
+            recipe_rows.append({'id': recipe_id, 'updated_at': now})
+        for ingredient_id, entry in entries:
+            ingredient_rows.append(dict(
+                {f: entry[f] for f in BREAKDOWN_FIELDS}, id=ingredient_id, ciqual_version=version))
+    if dry_run:
+        return
+    if recipe_rows:
+        db.session.execute(update(Recipe), recipe_rows)
+    if ingredient_rows:
+        db.session.execute(update(Ingredient), ingredient_rows)
+    db.session.commit()
+
+
+@carbs_cli.command('recompute')
+@click.option('--chunk-size', default=500, show_default=True, help="Recettes par paquet.")
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True,
+              help="Processus de calcul.")
+@click.option('--threshold', default=1.0, show_default=True,
+              help="Écart (g) au-delà duquel une recette est signalée.")
+@click.option('--dry-run', is_flag=True, help="Calcule et signale sans rien écrire.")
+def recompute(chunk_size, workers, threshold, dry_run):
+    """Recalcule les glucides de toutes les recettes (après un rechargement CIQUAL).
+
+    Les totaux des recettes dont un ingrédient reste non résolu ne sont pas
+    modifiés : elles sont listées pour vérification manuelle. Les recettes
+    sans ingrédient gardent leur total saisi."""
+    index = get_ciqual_index()
+    rows = [(f.id, f.name, f.carbs_per_100g, ' '.join(f.words), f.is_transformed)
+            for f in index.foods.values()]
+    click.echo(f"CIQUAL v{index.version} : {len(rows)} aliments, {workers} processus")
+
+    changed, incomplete = [], []
+    processed = 0
+
+    def collect(future, meta):
+        nonlocal processed
+        results = future.result()
+        for recipe_id, total, _ in results:
+            title, old_total = meta[recipe_id]
+            if total is None:
+                incomplete.append((recipe_id, title))
+            elif abs(total - old_total) > threshold:
+                changed.append((recipe_id, title, old_total, total))
+        _write_back(results, index.version, dry_run)
+        processed += len(results)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_recompute_worker,
+                             initargs=(rows, index.version,
+                                       current_app.config.get('CIQUAL_MATCHER'))) as pool:
+        pending = {}
+        for chunk, meta in _recipe_chunks(chunk_size):
+            pending[pool.submit(recompute_chunk, chunk)] = meta
+            # Au plus deux paquets en attente par processus
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, pending.pop(future))
+        for future in list(pending):
+            collect(future, pending.pop(future))
+
+    click.echo(f"✅ {processed} recettes traitées" + (" (simulation, rien n'est écrit)" if dry_run else ""))
+    if changed:
+        click.echo(f"\n{len(changed)} recette(s) modifiée(s) de plus de {threshold} g :")
+        for recipe_id, title, old_total, total in sorted(
+                changed, key=lambda c: abs(c[3] - c[2]), reverse=True):
+            click.echo(f"  #{recipe_id} {title} : {old_total:.1f} g -> {total:.1f} g "
+                       f"({total - old_total:+.1f} g)")
+    if incomplete:
+        click.echo(f"\n⚠️  {len(incomplete)} recette(s) avec ingrédients non résolus (total inchangé) :")
+        for recipe_id, title in incomplete:
+            click.echo(f"  #{recipe_id} {title}")
+
+
+def _build_store(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rows = db.session.execute(
+        select(CiqualFood.id, CiqualFood.alim_code, CiqualFood.name,
+               CiqualFood.tokens, CiqualFood.is_transformed)
+        .order_by(CiqualFood.id)
+    ).all()
+    version = current_ciqual_version()
+    try:
+        count = build_ciqual_store(path, rows, version)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ {count} aliments écrits dans {path} (v{version}, "
+               f"{os.path.getsize(path) // 1024} Ko)")
+
+
+@ciqual_cli.command('load')
+@click.option('--csv', 'csv_path', default=CIQUAL_CSV_PATH, show_default=True,
+              type=click.Path(exists=True, dir_okay=False), help="Export CIQUAL (latin-1, ';').")
+@click.option('--dry-run', is_flag=True, help="Affiche les différences sans rien écrire.")
+def load(csv_path, dry_run):
+    """Synchronise la table CIQUAL avec le fichier : ajoute, met à jour et
+    retire les aliments par code CIQUAL, puis reconstruit le stockage mmap."""
+    report = load_ciqual(csv_path, dry_run=dry_run)
+    for key, label in (('added', 'ajouté(s)'), ('changed', 'modifié(s)'), ('removed', 'retiré(s)')):
+        click.echo(f"{report[key]:>6} aliment(s) {label}")
+        for name in report['samples'][key]:
+            click.echo(f"         - {name}")
+        if report[key] > len(report['samples'][key]):
+            click.echo(f"         ...")
+
+    if dry_run:
+        click.echo(f"Simulation : rien n'est écrit ({report['total']} aliments en base).")
+    elif report['version'] is None:
+        click.echo(f"✅ Table CIQUAL déjà à jour ({report['total']} aliments).")
+    else:
+        click.echo(f"✅ Jeu CIQUAL v{report['version']} : {report['total']} aliments.")
+        _build_store(current_app.config['CIQUAL_STORE_PATH'])
+
+
+@ciqual_cli.command('build-store')
+@click.option('--output', default=None, help="Fichier à écrire (défaut : CIQUAL_STORE_PATH).")
+def build_store(output):
+    """Construit le fichier colonnaire mmap à partir de ciqual.csv et de la
+    table ciqual_foods (fait automatiquement par flask ciqual load) : tant que
+    sa version ne correspond pas, les workers relisent la base."""
+    _build_store(output or current_app.config['CIQUAL_STORE_PATH'])
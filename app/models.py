@@ -9,7 +9,9 @@ import uuid
 # Table d'association Recettes <-> Tags
 recipe_tags = db.Table('recipe_tags',
     db.Column('recipe_id', db.Integer, db.ForeignKey('recipes.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True),
+    # La clé primaire couvre recipe_id ; tag_id sert aux recettes d'un tag
+    db.Index('ix_recipe_tags_tag_id', 'tag_id')
 )
 
 class User(UserMixin, db.Model):
@@ -46,6 +48,15 @@ class User(UserMixin, db.Model):
 
 class Recipe(db.Model):
     __tablename__ = 'recipes'
+    __table_args__ = (
+        # Listes par utilisateur triées par date ou par titre (l'id départage
+        # la pagination par curseur)
+        db.Index('ix_recipes_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_recipes_user_title', 'user_id', 'title', 'id'),
+        # Filtres et tris « temps max » et « glucides par part » de l'index
+        db.Index('ix_recipes_user_total_time', 'user_id', 'total_time', 'id'),
+        db.Index('ix_recipes_user_carbs_per_serving', 'user_id', 'carbs_per_serving', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
@@ -59,27 +70,31 @@ class Recipe(db.Model):
     difficulty = db.Column(db.String(50))
     category = db.Column(db.String(100))
     total_carbs = db.Column(db.Float, default=0)
+    # Colonnes calculées par la base (lecture seule, à jour après le flush)
+    total_time = db.Column(db.Integer, db.Computed(
+        'coalesce(prep_time, 0) + coalesce(cook_time, 0)', persisted=True))
+    carbs_per_serving = db.Column(db.Float, db.Computed(
+        'CASE WHEN servings > 0 THEN coalesce(total_carbs, 0) / servings ELSE 0 END', persisted=True))
     rating = db.Column(db.Integer, nullable=True)
     source = db.Column(db.String(500), nullable=True)
     is_favorite = db.Column(db.Boolean, default=False, index=True)
     share_token = db.Column(db.String(64), unique=True, nullable=True, index=True)
+    # Texte indexé pour la recherche (voir utils/recipe_search.py)
+    search_document = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relations
-    ingredients = db.relationship('Ingredient', backref='recipe', lazy='dynamic', cascade='all, delete-orphan')
-    steps = db.relationship('Step', backref='recipe', lazy='dynamic', cascade='all, delete-orphan', order_by='Step.order')
+    # Relations (listes chargées à la demande ; les routes de liste les
+    # chargent en lot avec selectinload ; exports : utils/serializers.py)
+    ingredients = db.relationship('Ingredient', backref='recipe', lazy='select', cascade='all, delete-orphan',
+                                  order_by='Ingredient.id')
+    steps = db.relationship('Step', backref='recipe', lazy='select', cascade='all, delete-orphan', order_by='Step.order')
     # 🆕 Tags
-    tags = db.relationship('Tag', secondary=recipe_tags, lazy='subquery', backref=db.backref('recipes', lazy=True))
+    tags = db.relationship('Tag', secondary=recipe_tags, lazy='select', order_by='Tag.name',
+                           backref=db.backref('recipes', lazy=True))
     # 🆕 Historique lié à cette recette
     history_entries = db.relationship('CookingHistory', backref='recipe', lazy='dynamic')
     
-    @property
-    def carbs_per_serving(self):
-        if self.servings and self.servings > 0:
-            return self.total_carbs / self.servings
-        return 0
-     
     def generate_share_token(self):
         self.share_token = uuid.uuid4().hex
         return self.share_token
@@ -87,45 +102,52 @@ class Recipe(db.Model):
     def revoke_share_token(self):
         self.share_token = None
     
-    @property
-    def total_time(self):
-        return (self.prep_time or 0) + (self.cook_time or 0)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'tips': self.tips,
-            'image_filename': self.image_filename,
-            'prep_time': self.prep_time,
-            'cook_time': self.cook_time,
-            'servings': self.servings,
-            'difficulty': self.difficulty,
-            'category': self.category,
-            'total_carbs': self.total_carbs,
-            'rating': self.rating,
-            'source': self.source,
-            'is_favorite': self.is_favorite,
-            'carbs_per_serving': self.carbs_per_serving,
-            'ingredients': [ing.to_dict() for ing in self.ingredients],
-            'steps': [step.to_dict() for step in sorted(self.steps, key=lambda s: s.order)],
-            'tags': [tag.name for tag in self.tags] # 🆕
-        }
+    # Champs de to_dict() lus directement sur la table recipes
+    DICT_COLUMNS = ('id', 'title', 'description', 'tips', 'image_filename', 'prep_time', 'cook_time',
+                    'servings', 'difficulty', 'category', 'total_carbs', 'rating', 'source',
+                    'is_favorite', 'carbs_per_serving')
+    DICT_RELATIONS = ('ingredients', 'steps', 'tags')
+
+    def to_dict(self, fields=None):
+        """Représentation JSON ; `fields` restreint les clés (les relations
+        non demandées ne sont pas chargées)."""
+        if fields is None:
+            fields = self.DICT_COLUMNS + self.DICT_RELATIONS
+        data = {f: getattr(self, f) for f in self.DICT_COLUMNS if f in fields}
+        if 'ingredients' in fields:
+            data['ingredients'] = [ing.to_dict() for ing in self.ingredients]
+        if 'steps' in fields:
+            data['steps'] = [step.to_dict() for step in self.steps]
+        if 'tags' in fields:
+            data['tags'] = [tag.name for tag in self.tags]
+        return data
 
 class Ingredient(db.Model):
     __tablename__ = 'ingredients'
     id = db.Column(db.Integer, primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
     name = db.Column(db.String(200), nullable=False)
     quantity = db.Column(db.Float)
     unit = db.Column(db.String(50))
+    # Détail des glucides calculé à l'enregistrement (voir utils/carbs.py)
+    manual_weight_g = db.Column(db.Float)
+    weight_g = db.Column(db.Float)
+    carbs_g = db.Column(db.Float)
+    ciqual_food_id = db.Column(db.Integer)
+    matched_food_name = db.Column(db.String(255))
+    carb_status = db.Column(db.String(50))
+    ciqual_version = db.Column(db.Integer)
     
     def to_dict(self):
-        return {'id': self.id, 'name': self.name, 'quantity': self.quantity, 'unit': self.unit}
+        return {'id': self.id, 'name': self.name, 'quantity': self.quantity, 'unit': self.unit,
+                'weight_g': self.weight_g, 'carbs_g': self.carbs_g,
+                'matched_food': self.matched_food_name}
 
 class Step(db.Model):
     __tablename__ = 'steps'
+    __table_args__ = (
+        db.Index('ix_steps_recipe_order', 'recipe_id', 'order'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
     order = db.Column(db.Integer, nullable=False)
@@ -137,6 +159,9 @@ class Step(db.Model):
 
 class Category(db.Model):
     __tablename__ = 'categories'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_categories_user_name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -147,6 +172,9 @@ class Category(db.Model):
 # 🆕 MODÈLE TAGS
 class Tag(db.Model):
     __tablename__ = 'tags'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_tags_user_name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False) # ✅ Isolation
     name = db.Column(db.String(50), nullable=False)
@@ -157,9 +185,12 @@ class Tag(db.Model):
 # 🆕 MODÈLE HISTORIQUE
 class CookingHistory(db.Model):
     __tablename__ = 'cooking_history'
+    __table_args__ = (
+        db.Index('ix_cooking_history_user_cooked', 'user_id', 'cooked_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
     cooked_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -173,8 +204,40 @@ class CookingHistory(db.Model):
 class CiqualFood(db.Model):
     __tablename__ = 'ciqual_foods'
     id = db.Column(db.Integer, primary_key=True)
+    alim_code = db.Column(db.Integer, unique=True, index=True)  # code CIQUAL, clé des rechargements
     name = db.Column(db.String(255), nullable=False, index=True)
     carbs_per_100g = db.Column(db.Float, nullable=False)
+    # Précalculés au chargement (voir ciqual_matching.precompute_food_fields)
+    tokens = db.Column(db.Text)  # mots normalisés séparés par des espaces
+    is_transformed = db.Column(db.Boolean, default=False)
     
     def __repr__(self):
-        return f"<CiqualFood {self.name}>"
\ No newline at end of file
+        return f"<CiqualFood {self.name}>"
+
+class CiqualDataset(db.Model):
+    """Une ligne par (re)chargement de la table CIQUAL : l'id sert de version
+    pour invalider les index en mémoire des workers."""
+    __tablename__ = 'ciqual_datasets'
+    id = db.Column(db.Integer, primary_key=True)
+    food_count = db.Column(db.Integer, nullable=False, default=0)
+    loaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CiqualDataset v{self.id} ({self.food_count} aliments)>"
+
+
+class IngredientMatch(db.Model):
+    """Cache persistant nom d'ingrédient -> aliment CIQUAL retenu.
+    Vidé à chaque rechargement de la table CIQUAL."""
+    __tablename__ = 'ingredient_matches'
+    __table_args__ = (
+        db.UniqueConstraint('name_key', 'dataset_version', name='uq_ingredient_matches_key_version'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name_key = db.Column(db.String(200), nullable=False, index=True)
+    dataset_version = db.Column(db.Integer, nullable=True)
+    ciqual_food_id = db.Column(db.Integer, nullable=True)  # None = aucun aliment trouvé
+    score = db.Column(db.Float, nullable=False, default=0)
+    reason = db.Column(db.String(50), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
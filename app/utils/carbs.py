@@ -0,0 +1,131 @@
+"""
+Détail des glucides par ingrédient : conversion en grammes + aliment CIQUAL.
+
+Partagé par /api/calculate-carbs et l'enregistrement des recettes, pour que
+le détail stocké sur chaque Ingredient soit exactement celui affiché lors
+du calcul.
+"""
+import logging
+from app.utils.ciqual_matching import CiqualIndex, find_best_ciqual_matches, get_ciqual_index
+from app.utils.nutrition_conversion import convert_many
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = 'ok'
+
+# Colonnes d'Ingredient alimentées par compute_carb_breakdown
+BREAKDOWN_FIELDS = ('weight_g', 'carbs_g', 'ciqual_food_id', 'matched_food_name', 'carb_status')
+
+
+def compute_carb_breakdown(items, index=None):
+    """items : liste de (nom, quantité, unité, poids manuel en g ou None).
+    Retourne, dans le même ordre, un dict par ingrédient avec weight_g,
+    carbs_g, ciqual_food_id, matched_food_name et carb_status (STATUS_OK ou
+    la raison de l'échec), ainsi que la version CIQUAL utilisée.
+
+    Sans `index`, passe par l'index du processus et le cache des
+    correspondances ; avec, n'utilise que cet index (aucun accès base)."""
+    converted = convert_many([(name, qty, unit) for name, qty, unit, _ in items])
+
+    weights = []
+    for (_, _, _, manual_weight), weight_g in zip(items, converted):
+        if manual_weight is not None:
+            try:
+                weight_g = float(manual_weight)
+            except (TypeError, ValueError):
+                weight_g = None
+        weights.append(weight_g)
+
+    names = [name for (name, _, _, _), w in zip(items, weights) if w is not None]
+    if index is None:
+        foods, unmatched = find_best_ciqual_matches(names)
+        version = get_ciqual_index().version
+    else:
+        foods, unmatched = index.find_many(names)
+        version = index.version
+
+    breakdown = []
+    for (name, _, _, _), weight_g in zip(items, weights):
+        entry = {'weight_g': weight_g, 'carbs_g': None, 'ciqual_food_id': None,
+                 'matched_food_name': None, 'carb_status': STATUS_OK}
+        food = foods.get(name)
+        if weight_g is None:
+            entry['carb_status'] = 'unite_non_convertible'
+        elif not food:
+            entry['carb_status'] = unmatched.get(name, 'aliment_non_trouve')
+        else:
+            entry.update(carbs_g=(weight_g * food.carbs_per_100g) / 100.0,
+                         ciqual_food_id=food.id, matched_food_name=food.name)
+        breakdown.append(entry)
+
+    return breakdown, version
+
+
+def fill_carb_breakdown(ingredients):
+    """Calcule en un seul lot le détail de glucides d'objets Ingredient et
+    le reporte sur chacun (BREAKDOWN_FIELDS et ciqual_version).
+
+    Chemin commun à l'enregistrement des recettes et aux imports ; en cas
+    d'échec, l'erreur est journalisée et les ingrédients restent sans détail."""
+    if not ingredients:
+        return
+    try:
+        # Comme le calcul auto du formulaire : sans quantité, on compte 1 unité
+        breakdown, version = compute_carb_breakdown([
+            (ing.name, ing.quantity if ing.quantity and ing.quantity > 0 else 1,
+             (ing.unit or '').strip(), ing.manual_weight_g)
+            for ing in ingredients])
+    except Exception as e:
+        logger.error(f"Erreur détail glucides: {e}")
+        return
+    for ingredient, entry in zip(ingredients, breakdown):
+        for field, value in entry.items():
+            setattr(ingredient, field, value)
+        ingredient.ciqual_version = version
+
+
+# ── RECALCUL EN MASSE (flask carbs recompute) ────────────────
+_worker_index = None
+
+
+def init_recompute_worker(rows, version, matcher):
+    """Initialisation d'un processus du pool : reconstruit l'index CIQUAL à
+    partir des lignes envoyées par le parent, sans connexion à la base."""
+    global _worker_index
+    index_class = CiqualIndex
+    if matcher == 'numpy':
+        try:
+            from app.utils.ciqual_numpy import NumpyCiqualIndex
+            index_class = NumpyCiqualIndex
+        except ImportError:
+            pass
+    _worker_index = index_class(rows, version)
+
+
+def recompute_chunk(recipes):
+    """recipes : [(recipe_id, [(ingredient_id, nom, qté, unité, poids manuel)])].
+    Retourne [(recipe_id, nouveau total ou None, [(ingredient_id, détail)])].
+    Le total vaut None si un ingrédient n'a pas pu être résolu : on ne
+    remplace jamais un total saisi par une somme incomplète. Les recettes
+    sans ingrédient n'ont rien à recalculer : elles sont omises."""
+    items, owners = [], []
+    for recipe_id, ingredients in recipes:
+        for ingredient_id, name, qty, unit, manual_weight in ingredients:
+            # Comme le calcul auto du formulaire : sans quantité, on compte 1 unité
+            items.append((name, qty if qty and qty > 0 else 1, (unit or '').strip(), manual_weight))
+            owners.append((recipe_id, ingredient_id))
+
+    breakdown, _ = compute_carb_breakdown(items, index=_worker_index)
+
+    per_recipe = {recipe_id: [] for recipe_id, _ in recipes}
+    for (recipe_id, ingredient_id), entry in zip(owners, breakdown):
+        per_recipe[recipe_id].append((ingredient_id, entry))
+
+    results = []
+    for recipe_id, entries in per_recipe.items():
+        if not entries:
+            continue
+        complete = all(e['carb_status'] == STATUS_OK for _, e in entries)
+        total = round(sum(e['carbs_g'] for _, e in entries), 1) if complete else None
+        results.append((recipe_id, total, entries))
+    return results
@@ -0,0 +1,70 @@
+import csv
+import os
+
+CIQUAL_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'data', 'ciqual.csv')
+
+# Export officiel ANSES : latin-1, séparateur ';', en-têtes sur plusieurs lignes
+CIQUAL_ENCODING = 'latin-1'
+GLUCIDES_KEY = 'Glucides\n(g\n100 g)'
+# Les colonnes de nutriments suivent le nom scientifique de l'aliment
+FIRST_NUTRIENT_COLUMN = 'alim_nom_sci'
+
+
+def parse_nutrient(raw):
+    """Convertit une valeur CIQUAL en float, ou None si non mesurée ('-', vide)."""
+    val = (raw or '').strip()
+    if not val or val == '-':
+        return None
+    if val.lower() == 'traces':
+        return 0.05
+    if val.startswith('<'):
+        val = val.replace('<', '').strip()
+    val = val.replace(',', '.')
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+
+def parse_carbs(raw):
+    """Convertit une valeur CIQUAL en float, ou 0.0 si non mesurable/inconnue."""
+    value = parse_nutrient(raw)
+    return value if value is not None else 0.0
+
+
+def iter_ciqual_foods(csv_path=CIQUAL_CSV_PATH):
+    """Parcourt le fichier CIQUAL ligne à ligne : (code CIQUAL, nom, glucides pour 100 g)."""
+    with open(csv_path, 'r', encoding=CIQUAL_ENCODING) as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            name = (row.get('alim_nom_fr') or '').strip()
+            code = (row.get('alim_code') or '').strip()
+            if name and code.isdigit():
+                yield int(code), name, parse_carbs(row.get(GLUCIDES_KEY, ''))
+
+
+def read_ciqual_csv(csv_path=CIQUAL_CSV_PATH):
+    """Liste des (nom, glucides pour 100 g) du fichier CIQUAL, dans l'ordre du fichier."""
+    return [(name, carbs) for _, name, carbs in iter_ciqual_foods(csv_path)]
+
+
+def read_ciqual_table(csv_path=CIQUAL_CSV_PATH):
+    """Fichier CIQUAL complet : (libellés des nutriments, lignes).
+    Chaque ligne vaut (code CIQUAL, nom, [valeurs pour 100 g ou None]), dans
+    l'ordre du fichier et avec le même filtrage que iter_ciqual_foods."""
+    with open(csv_path, 'r', encoding=CIQUAL_ENCODING) as f:
+        reader = csv.reader(f, delimiter=';')
+        header = next(reader)
+        code_col, name_col = header.index('alim_code'), header.index('alim_nom_fr')
+        first = header.index(FIRST_NUTRIENT_COLUMN) + 1
+        labels = [' '.join(h.split()) for h in header[first:]]
+        foods = []
+        for row in reader:
+            name = row[name_col].strip() if len(row) > name_col else ''
+            if not name or not row[code_col].strip().isdigit():
+                continue
+            code = int(row[code_col])
+            values = [parse_nutrient(v) for v in row[first:first + len(labels)]]
+            values += [None] * (len(labels) - len(values))
+            foods.append((code, name, values))
+    return labels, foods
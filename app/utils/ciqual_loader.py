@@ -0,0 +1,156 @@
+"""
+Chargement incrémental de la table CIQUAL (flask ciqual load).
+
+Le CSV est lu en flux et déversé dans une table temporaire de transit
+(COPY sous PostgreSQL, insertions par paquets ailleurs), puis comparé à
+ciqual_foods par code CIQUAL : seuls les aliments ajoutés, modifiés ou
+retirés sont écrits. Les ids des aliments inchangés sont conservés.
+
+Tout se fait dans une seule transaction, nouvelle version du jeu comprise :
+les lecteurs voient l'ancienne table complète jusqu'au COMMIT, puis la
+nouvelle, jamais une table vide ou à moitié chargée. Les index en mémoire
+ne changent de version qu'après ce COMMIT.
+"""
+import csv
+import io
+from sqlalchemy import (Boolean, Column, Float, Integer, MetaData, String, Table, Text,
+                        exists, func, insert, or_, select)
+from app import db
+from app.models import CiqualFood, CiqualDataset, IngredientMatch
+from app.utils.ciqual_data import CIQUAL_CSV_PATH, iter_ciqual_foods
+from app.utils.ciqual_matching import invalidate_ciqual_index, precompute_food_fields
+
+STAGING_BATCH_SIZE = 1000
+SAMPLE_SIZE = 10
+# Verrou consultatif PostgreSQL : un seul chargement à la fois
+LOAD_LOCK_ID = 0x43495155  # 'CIQU'
+
+# Colonnes recopiées depuis la table de transit (alim_code sert de clé)
+DATA_COLUMNS = ('name', 'carbs_per_100g', 'tokens', 'is_transformed')
+
+
+def _staging_table():
+    return Table(
+        'ciqual_staging', MetaData(),
+        Column('alim_code', Integer, primary_key=True),
+        Column('name', String(255), nullable=False),
+        Column('carbs_per_100g', Float, nullable=False),
+        Column('tokens', Text),
+        Column('is_transformed', Boolean),
+        prefixes=['TEMPORARY'],
+    )
+
+
+def _staged_rows(csv_path):
+    for code, name, carbs in iter_ciqual_foods(csv_path):
+        fields = precompute_food_fields(name)
+        yield (code, name, carbs, fields['tokens'], fields['is_transformed'])
+
+
+class _CsvStream:
+    """Fichier en lecture seule alimenté par un générateur de lignes, pour
+    que COPY consomme le CSV sans qu'il soit chargé en mémoire."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+def _fill_staging(conn, staging, rows):
+    columns = [c.name for c in staging.columns]
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {staging.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                _CsvStream(rows))
+        finally:
+            cursor.close()
+        return
+
+    batch = []
+    for row in rows:
+        batch.append(dict(zip(columns, row)))
+        if len(batch) >= STAGING_BATCH_SIZE:
+            conn.execute(staging.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(staging.insert(), batch)
+
+
+def load_ciqual(csv_path=CIQUAL_CSV_PATH, dry_run=False):
+    """Synchronise ciqual_foods avec le fichier CIQUAL. Retourne un rapport :
+    nombres et exemples d'aliments ajoutés, modifiés et retirés, nombre total
+    d'aliments et version du jeu (nouvelle uniquement si quelque chose a changé).
+
+    Les aliments sans code (chargés par un ancien seeder) sont retirés."""
+    live = CiqualFood.__table__
+    staging = _staging_table()
+
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(select(func.pg_advisory_xact_lock(LOAD_LOCK_ID)))
+        staging.drop(conn, checkfirst=True)
+        staging.create(conn)
+        _fill_staging(conn, staging, _staged_rows(csv_path))
+
+        same_code = live.c.alim_code == staging.c.alim_code
+        is_new = ~exists().where(same_code)
+        is_removed = or_(live.c.alim_code.is_(None), ~exists().where(same_code))
+        is_changed = or_(*(live.c[col].is_distinct_from(staging.c[col]) for col in DATA_COLUMNS))
+
+        report = {
+            'added': conn.scalar(select(func.count()).select_from(staging).where(is_new)),
+            'changed': conn.scalar(select(func.count()).select_from(live.join(staging, same_code))
+                                   .where(is_changed)),
+            'removed': conn.scalar(select(func.count()).select_from(live).where(is_removed)),
+            'samples': {
+                'added': conn.scalars(select(staging.c.name).where(is_new)
+                                      .order_by(staging.c.alim_code).limit(SAMPLE_SIZE)).all(),
+                'changed': conn.scalars(select(live.c.name).join(staging, same_code).where(is_changed)
+                                        .order_by(live.c.alim_code).limit(SAMPLE_SIZE)).all(),
+                'removed': conn.scalars(select(live.c.name).where(is_removed)
+                                        .order_by(live.c.id).limit(SAMPLE_SIZE)).all(),
+            },
+            'version': None,
+        }
+        has_changes = report['added'] or report['changed'] or report['removed']
+
+        if has_changes and not dry_run:
+            conn.execute(live.update().where(same_code).where(is_changed)
+                         .values({col: staging.c[col] for col in DATA_COLUMNS}))
+            conn.execute(live.delete().where(is_removed))
+            conn.execute(live.insert().from_select(
+                ('alim_code',) + DATA_COLUMNS,
+                select(staging.c.alim_code, *(staging.c[col] for col in DATA_COLUMNS))
+                .where(is_new).order_by(staging.c.alim_code)))
+
+        report['total'] = conn.scalar(select(func.count()).select_from(live))
+        if has_changes and not dry_run:
+            # Nouvelle version : les correspondances mémorisées sont obsolètes
+            # et les index en mémoire des workers se reconstruisent
+            conn.execute(IngredientMatch.__table__.delete())
+            report['version'] = conn.execute(
+                insert(CiqualDataset.__table__).values(food_count=report['total'])
+            ).inserted_primary_key[0]
+        staging.drop(conn)
+
+    if report['version'] is not None:
+        invalidate_ciqual_index()
+    return report
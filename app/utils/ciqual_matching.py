@@ -1,6 +1,17 @@
+import os
 import re
+import time
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict, namedtuple
+from datetime import datetime
+from functools import lru_cache
+from flask import current_app
 from sqlalchemy import func
-from app.models import CiqualFood
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import CiqualFood, CiqualDataset, IngredientMatch
 
 # Mots signalant un produit transformé/composé — pénalisés fortement
 # sauf si l'ingrédient de la recette les mentionne explicitement
@@ -9,6 +20,13 @@ EXCLUDED_KEYWORDS = ['préemballé', 'tartinade', 'sauce', 'plat cuisiné',
                      'glace', 'gâteau', 'cake', 'biscuit', 'tzatziki']
 
 
+def fold_accents(text):
+    """Minuscules sans accents : « Crème brûlée » -> « creme brulee »."""
+    text = text.lower().replace('œ', 'oe').replace('æ', 'ae')
+    return ''.join(c for c in unicodedata.normalize('NFKD', text)
+                   if not unicodedata.combining(c))
+
+
 def singularize_fr(word):
     if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
         return word[:-1]
@@ -16,10 +34,27 @@ def singularize_fr(word):
 
 
 def normalize_words(text):
-    words = re.findall(r"[a-zàâäéèêëïîôöùûüç']+", text.lower())
+    words = re.findall(r"[a-z']+", fold_accents(text))
     return [singularize_fr(w) for w in words if len(w) > 2]
 
 
+def is_transformed(food_name):
+    name_lower = food_name.lower()
+    return any(kw in name_lower for kw in EXCLUDED_KEYWORDS)
+
+
+def precompute_food_fields(food_name):
+    """Colonnes dérivées d'un nom CIQUAL, calculées une seule fois au chargement."""
+    return {
+        'tokens': ' '.join(normalize_words(food_name)),
+        'is_transformed': is_transformed(food_name),
+    }
+
+
+def autocomplete_words(folded_text):
+    return re.findall(r"[a-z0-9]+", folded_text)
+
+
 def words_match(search_word, food_word):
     """Compare par préfixe (min 4 lettres communes) pour absorber les variantes
     grammaticales : grec/grecque, poivron/poivrons, etc."""
@@ -32,38 +67,430 @@ def words_match(search_word, food_word):
     return search_word[:prefix_len] == food_word[:prefix_len]
 
 
-def find_best_ciqual_match(ingredient_name):
-    name_clean = ingredient_name.strip()
+# ── INDEX EN MÉMOIRE ─────────────────────────────────────────
+# Aliment détaché de la session : l'API de calcul n'a plus besoin de la base
+IndexedFood = namedtuple('IndexedFood', 'id name carbs_per_100g words is_transformed')
+
+
+def accented_words(text):
+    """Mots d'un nom comme les découpait le matcher d'origine : minuscules,
+    accents conservés (« pâte » et « pâté » restent distincts)."""
+    words = re.findall(r"[a-zàâäéèêëïîôöùûüç']+", text.lower())
+    return [singularize_fr(w) for w in words if len(w) > 2]
+
+
+class WordIndex:
+    """Index inversé mot -> ids d'aliments pour une normalisation des noms,
+    avec les noms correspondants pour le filtre des candidats."""
+
+    def __init__(self, name, words_by_food, names):
+        self.name = name
+        self.names = names
+        self.postings = defaultdict(set)
+        # Les mots de 4 lettres ou plus, regroupés par préfixe de 4 lettres :
+        # tout mot compatible avec words_match() partage ce préfixe
+        self.prefixes = defaultdict(set)
+        for food_id, words in words_by_food.items():
+            for word in words:
+                self.postings[word].add(food_id)
+                if len(word) >= 4:
+                    self.prefixes[word[:4]].add(word)
+        self.substring_ids = lru_cache(maxsize=4096)(self._substring_ids)
+
+    def matching_words(self, search_word):
+        """Mots du vocabulaire compatibles avec search_word (words_match)."""
+        words = {search_word} if search_word in self.postings else set()
+        if len(search_word) >= 4:
+            words.update(fw for fw in self.prefixes.get(search_word[:4], ())
+                         if words_match(search_word, fw))
+        return words
+
+    def matching_ids(self, search_word):
+        """Ids des aliments ayant au moins un mot compatible avec search_word."""
+        ids = set()
+        for food_word in self.matching_words(search_word):
+            ids |= self.postings[food_word]
+        return ids
+
+    def _substring_ids(self, search_word):
+        """Ids des aliments dont le nom contient search_word : les candidats
+        du filtre d'origine ILIKE '%mot%'."""
+        return frozenset(food_id for food_id, name in self.names.items()
+                         if search_word in name)
+
+
+class CiqualIndex:
+    """Index inversé mot -> ids d'aliments, construit une fois par processus.
+
+    Le matching suit le matcher d'origine (mots et noms avec accents) ; les
+    mots sans accents ne servent que si celui-ci ne trouve rien, par exemple
+    pour « creme fraiche » tapé sans accents."""
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.foods = {}
+        self.by_name = {}
+
+        for food_id, name, carbs, tokens, transformed in rows:
+            # Les lignes chargées avant l'ajout des colonnes précalculées
+            # sont normalisées à la volée
+            if tokens is None or transformed is None:
+                fields = precompute_food_fields(name)
+                tokens, transformed = fields['tokens'], fields['is_transformed']
+            words = tuple(tokens.split())
+            self.foods[food_id] = IndexedFood(food_id, name, carbs, words, transformed)
+            self.by_name.setdefault(name.lower(), food_id)
+
+        self.folded_names = {food.id: fold_accents(food.name) for food in self.foods.values()}
+        # Dans l'ordre d'essai de _resolve()
+        self.word_indexes = (
+            WordIndex('accented',
+                      {food.id: accented_words(food.name) for food in self.foods.values()},
+                      {food.id: food.name.lower() for food in self.foods.values()}),
+            WordIndex('folded', {food.id: food.words for food in self.foods.values()},
+                      self.folded_names),
+        )
+
+        # Autocomplétion : mots bruts (sans singularisation ni filtre de
+        # longueur) triés, pour retrouver tous les mots d'un préfixe par bisect
+        self.complete_postings = defaultdict(set)
+        for food_id, folded in self.folded_names.items():
+            for word in autocomplete_words(folded):
+                self.complete_postings[word].add(food_id)
+        self.complete_vocab = sorted(self.complete_postings)
+        self.autocomplete = lru_cache(maxsize=1024)(self._autocomplete)
+
+    @classmethod
+    def from_db(cls, version=None):
+        rows = db.session.query(
+            CiqualFood.id, CiqualFood.name, CiqualFood.carbs_per_100g,
+            CiqualFood.tokens, CiqualFood.is_transformed
+        ).order_by(CiqualFood.id).all()
+        return cls(rows, version)
+
+    def __len__(self):
+        return len(self.foods)
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        start = bisect_left(self.complete_vocab, prefix)
+        for word in self.complete_vocab[start:]:
+            if not word.startswith(prefix):
+                break
+            ids |= self.complete_postings[word]
+        return ids
+
+    def _autocomplete(self, query, limit=20):
+        """Aliments dont chaque mot de la requête débute un mot du nom,
+        classés : produits bruts d'abord, nom commençant par la requête,
+        puis noms courts."""
+        folded_query = fold_accents(query).strip()
+        prefixes = autocomplete_words(folded_query)
+        if not prefixes:
+            return ()
+        ids = self._prefix_ids(prefixes[0])
+        for prefix in prefixes[1:]:
+            if not ids:
+                break
+            ids &= self._prefix_ids(prefix)
+
+        def rank(food_id):
+            food = self.foods[food_id]
+            return (food.is_transformed,
+                    not self.folded_names[food_id].startswith(folded_query),
+                    len(food.name), food.name)
+
+        return tuple(self.foods[i] for i in sorted(ids, key=rank)[:limit])
+
+    def find(self, ingredient_name):
+        return self._resolve(ingredient_name, {})[0]
+
+    def find_many(self, ingredient_names):
+        """Retourne ({nom: aliment}, {nom: raison}) pour les noms non trouvés."""
+        matches, unmatched = {}, {}
+        for name, (food, _, reason) in self.resolve_many(ingredient_names).items():
+            if food:
+                matches[name] = food
+            else:
+                unmatched[name] = reason
+        return matches, unmatched
+
+    def resolve_many(self, ingredient_names):
+        """Résout une liste de noms en une passe : chaque nom distinct n'est
+        évalué qu'une fois et les mots communs partagent leurs ids candidats.
+        Retourne {nom: (aliment ou None, score, raison ou None)}."""
+        results = {}
+        word_cache = {}
+        for name in ingredient_names:
+            if name not in results:
+                results[name] = self._resolve(name, word_cache)
+        return results
+
+    def _resolve(self, ingredient_name, word_cache):
+        name_clean = ingredient_name.strip()
+
+        exact_id = self.by_name.get(name_clean.lower())
+        if exact_id is not None:
+            return self.foods[exact_id], 1.0, None
+
+        searches = [(self.word_indexes[0], accented_words(name_clean)),
+                    (self.word_indexes[1], normalize_words(name_clean))]
+        if not any(words for _, words in searches):
+            return None, 0.0, 'nom_non_exploitable'
+
+        for word_index, search_words in searches:
+            best = self._best_match(word_index, search_words, word_cache) if search_words else None
+            if best is not None:
+                food_id, match_ratio = best
+                return self.foods[food_id], match_ratio, None
+        return None, 0.0, 'aliment_non_trouve'
+
+    def _best_match(self, word_index, search_words, word_cache):
+        """Meilleur (id, ratio) parmi les aliments dont le nom contient le
+        premier mot, ou None. Surchargé par les autres moteurs de score.
+
+        Comme dans le matcher d'origine, un aliment qui n'a qu'un mot de même
+        préfixe que le premier mot (« Thym, frais » pour « fraises ») n'est
+        pas candidat."""
+        matches = []
+        for sw in search_words:
+            key = (word_index.name, sw)
+            if key not in word_cache:
+                word_cache[key] = word_index.matching_ids(sw)
+            matches.append(word_cache[key])
+        candidates = word_index.substring_ids(search_words[0])
+        if not candidates:
+            return None
 
-    exact = CiqualFood.query.filter(
-        func.lower(CiqualFood.name) == name_clean.lower()
-    ).first()
-    if exact:
-        return exact
+        def score(food_id):
+            food = self.foods[food_id]
+            matched = sum(1 for ids in matches if food_id in ids)
+            match_ratio = matched / len(search_words)
+            transform_penalty = -10 if food.is_transformed else 0
+            return (round(match_ratio, 3), transform_penalty, -len(food.name))
 
-    search_words = normalize_words(name_clean)
-    if not search_words:
+        best = max(sorted(candidates), key=score)
+        best_ratio = score(best)[0]
+        if best_ratio > 0:
+            return best, best_ratio
         return None
 
-    candidates = CiqualFood.query.filter(
-        CiqualFood.name.ilike(f"%{search_words[0]}%")
-    ).all()
+_index = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def current_ciqual_version():
+    return db.session.query(func.max(CiqualDataset.id)).scalar()
+
+
+def _index_class():
+    """Moteur de score choisi par CIQUAL_MATCHER ('python' ou 'numpy')."""
+    if current_app.config.get('CIQUAL_MATCHER') == 'numpy':
+        try:
+            from app.utils.ciqual_numpy import NumpyCiqualIndex
+            return NumpyCiqualIndex
+        except ImportError:
+            current_app.logger.warning("NumPy indisponible : moteur de matching Python utilisé")
+    return CiqualIndex
+
 
-    if not candidates:
+_store = None
+_store_stamp = None
+
+
+def get_ciqual_store():
+    """Stockage colonnaire mmap du processus (CIQUAL_STORE_PATH), rouvert
+    quand le fichier est reconstruit ; None s'il n'existe pas."""
+    global _store, _store_stamp
+    path = current_app.config.get('CIQUAL_STORE_PATH')
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None:
         return None
 
-    def score(food):
-        food_words = normalize_words(food.name)
-        matched = sum(
-            1 for sw in search_words
-            if any(words_match(sw, fw) for fw in food_words)
-        )
-        match_ratio = matched / len(search_words)
-        is_transformed = any(kw in food.name.lower() for kw in EXCLUDED_KEYWORDS)
-        transform_penalty = -10 if is_transformed else 0
-        return (round(match_ratio, 3), transform_penalty, -len(food.name))
-
-    best = max(candidates, key=score)
-    if score(best)[0] > 0:
-        return best
-    return None
\ No newline at end of file
+    stamp = (path, stat.st_ino, stat.st_mtime_ns)
+    if stamp != _store_stamp:
+        from app.utils.ciqual_store import CiqualStore
+        try:
+            # L'ancien mmap reste valide pour les appelants qui le détiennent
+            _store, _store_stamp = CiqualStore(path), stamp
+        except (OSError, ValueError) as e:
+            current_app.logger.error(f"Stockage CIQUAL illisible ({path}) : {e}")
+            _store, _store_stamp = None, stamp
+    return _store
+
+
+def _build_index(version):
+    """Construit l'index de `version`. Les lignes et la version sont lues par
+    deux requêtes : la version est relue après coup et, si un chargement a été
+    validé entre les deux, on recommence, pour ne jamais étiqueter v1 un index
+    construit sur les lignes de v2."""
+    for _ in range(3):
+        store = get_ciqual_store()
+        if store is not None and store.version == version:
+            return _index_class()(store.index_rows(), version), 'mmap'
+        index = _index_class().from_db(version)
+        latest = current_ciqual_version()
+        if latest == version:
+            return index, 'base'
+        version = latest
+    # Chargements en rafale : l'index sera reconstruit à la prochaine vérification
+    return index, 'base'
+
+
+def get_ciqual_index():
+    """Index partagé du processus. La version du jeu CIQUAL n'est relue en base
+    qu'une fois toutes les CIQUAL_INDEX_TTL secondes ; l'index est reconstruit
+    si un nouveau chargement a eu lieu entre-temps.
+
+    Pendant une reconstruction, les autres threads continuent avec l'index
+    courant : le nouvel index ne remplace l'ancien qu'une fois complet."""
+    global _index, _index_checked_at
+    ttl = current_app.config.get('CIQUAL_INDEX_TTL', 60)
+    if _index is not None and time.monotonic() - _index_checked_at < ttl:
+        return _index
+
+    if not _index_lock.acquire(blocking=_index is None):
+        return _index
+    try:
+        if _index is None or time.monotonic() - _index_checked_at >= ttl:
+            version = current_ciqual_version()
+            if _index is None or _index.version != version:
+                index, source = _build_index(version)
+                _index = index
+                current_app.logger.info(
+                    f"Index CIQUAL construit : {len(index)} aliments (v{index.version}, {source})")
+            _index_checked_at = time.monotonic()
+    finally:
+        _index_lock.release()
+    return _index
+
+
+def invalidate_ciqual_index():
+    """À appeler après la validation d'un chargement : force la relecture de
+    la version au prochain appel, sans retirer l'index courant."""
+    global _index_checked_at
+    _index_checked_at = float('-inf')
+    _match_cache.clear()
+
+
+# ── CACHE DES CORRESPONDANCES ────────────────────────────────
+class _LRUCache:
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        return None
+
+    def put(self, key, value, maxsize):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_match_cache = _LRUCache()
+
+
+def match_key(ingredient_name):
+    """Clé du cache : la même que celle du match exact sur le nom."""
+    return ingredient_name.strip().lower()[:200]
+
+
+def _load_cached_matches(keys, version):
+    rows = IngredientMatch.query.filter(
+        IngredientMatch.name_key.in_(keys),
+        IngredientMatch.dataset_version == version
+    ).all()
+    return {r.name_key: (r.ciqual_food_id, r.score, r.reason) for r in rows}
+
+
+def _store_matches(entries, version):
+    """Ajoute les nouvelles correspondances à la transaction de l'appelant,
+    sur sa connexion : une seconde connexion attendrait le verrou d'écriture
+    SQLite tenu par la requête. Le point de sauvegarde isole un échec, qui
+    n'annule pas le reste de la transaction."""
+    rows = [{'name_key': key, 'dataset_version': version, 'ciqual_food_id': food_id,
+             'score': score, 'reason': reason, 'created_at': datetime.utcnow()}
+            for key, (food_id, score, reason) in entries.items()]
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return
+    # Une ligne écrite avec un index périmé (fenêtre du TTL) est remplacée
+    stmt = insert(IngredientMatch.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name_key', 'dataset_version'],
+        set_={c: stmt.excluded[c] for c in ('ciqual_food_id', 'score', 'reason', 'created_at')})
+    try:
+        with db.session.begin_nested():
+            db.session.execute(stmt, rows)
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"Cache ingredient_matches non mis à jour : {e}")
+
+
+def find_best_ciqual_match(ingredient_name):
+    matches, _ = find_best_ciqual_matches([ingredient_name])
+    return matches.get(ingredient_name)
+
+
+def find_best_ciqual_matches(ingredient_names):
+    """Version par lot de find_best_ciqual_match : ({nom: aliment}, {nom: raison}).
+
+    Chaque nom passe par le cache LRU du processus, puis par la table
+    ingredient_matches (une seule requête pour tout le lot) ; seuls les noms
+    jamais vus sont réellement évalués. Le résultat est ajouté à la session :
+    il est enregistré au commit de l'appelant."""
+    index = get_ciqual_index()
+    version = index.version
+    maxsize = current_app.config.get('CIQUAL_MATCH_CACHE_SIZE', 2048)
+
+    resolved = {}
+    for name in ingredient_names:
+        key = match_key(name)
+        if key not in resolved:
+            cached = _match_cache.get((version, key))
+            if cached is not None:
+                resolved[key] = cached
+
+    missing = {match_key(n) for n in ingredient_names} - resolved.keys()
+    if missing:
+        stored = _load_cached_matches(missing, version)
+        stored = {k: v for k, v in stored.items()
+                  if v[0] is None or v[0] in index.foods}
+        resolved.update(stored)
+        missing -= stored.keys()
+
+    if missing:
+        computed = {}
+        for key, (food, score, reason) in index.resolve_many(missing).items():
+            computed[key] = (food.id if food else None, score, reason)
+        resolved.update(computed)
+        _store_matches(computed, version)
+
+    matches, unmatched = {}, {}
+    for name in ingredient_names:
+        key = match_key(name)
+        food_id, _, reason = resolved[key]
+        _match_cache.put((version, key), resolved[key], maxsize)
+        if food_id is not None:
+            matches[name] = index.foods[food_id]
+        else:
+            unmatched[name] = reason
+    return matches, unmatched
@@ -0,0 +1,72 @@
+"""
+Moteur de score vectorisé pour le matching CIQUAL (CIQUAL_MATCHER = 'numpy').
+
+Le vocabulaire de chaque WordIndex est encodé en ids de mots et les
+aliments en matrice creuse mot -> positions d'aliments (format CSR). Pour
+un ingrédient, chaque mot recherché donne un vecteur booléen « l'aliment
+contient un mot compatible » ; ratio, pénalité de transformation et longueur du nom sont
+ensuite départagés pour tous les aliments en une seule opération NumPy.
+
+Le classement est strictement celui de CiqualIndex._best_match.
+"""
+import numpy as np
+from app.utils.ciqual_matching import CiqualIndex
+
+
+class NumpyCiqualIndex(CiqualIndex):
+
+    def __init__(self, rows, version=None):
+        super().__init__(rows, version)
+        # Position i <-> id d'aliment croissant, comme le tri du moteur Python
+        self.ids = np.array(sorted(self.foods), dtype=np.int64)
+        self.position = {food_id: i for i, food_id in enumerate(self.ids.tolist())}
+        self.name_len = np.array(
+            [len(self.foods[i].name) for i in self.ids.tolist()], dtype=np.int32)
+        self.transformed = np.array(
+            [self.foods[i].is_transformed for i in self.ids.tolist()], dtype=bool)
+        # Une matrice CSR (vocabulaire, pointeurs, positions) par WordIndex
+        self.csr = {word_index.name: self._csr(word_index) for word_index in self.word_indexes}
+
+    def _csr(self, word_index):
+        vocab = {word: i for i, word in enumerate(word_index.postings)}
+        postings = [sorted(self.position[food_id] for food_id in word_index.postings[word])
+                    for word in vocab]
+        word_ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in postings], out=word_ptr[1:])
+        word_foods = np.fromiter(
+            (pos for p in postings for pos in p), dtype=np.int32, count=int(word_ptr[-1]))
+        return vocab, word_ptr, word_foods
+
+    def word_hits(self, word_index, search_word):
+        """Vecteur booléen des aliments contenant un mot compatible."""
+        vocab, word_ptr, word_foods = self.csr[word_index.name]
+        hits = np.zeros(len(self.ids), dtype=bool)
+        word_ids = [vocab[w] for w in word_index.matching_words(search_word)]
+        if word_ids:
+            hits[np.concatenate(
+                [word_foods[word_ptr[w]:word_ptr[w + 1]] for w in word_ids]
+            )] = True
+        return hits
+
+    def _best_match(self, word_index, search_words, word_cache):
+        for sw in search_words:
+            key = (word_index.name, sw)
+            if key not in word_cache:
+                word_cache[key] = self.word_hits(word_index, sw)
+        hits = np.vstack([word_cache[(word_index.name, sw)] for sw in search_words])
+
+        # Candidats : noms contenant le premier mot, positions croissantes
+        candidates = np.searchsorted(self.ids, sorted(word_index.substring_ids(search_words[0])))
+        if not len(candidates):
+            return None
+
+        matched = hits[:, candidates].sum(axis=0)
+        # np.lexsort trie sur la dernière clé d'abord : plus de mots trouvés,
+        # puis non transformé, puis nom le plus court, puis id le plus petit
+        order = np.lexsort((candidates, self.name_len[candidates],
+                            self.transformed[candidates], -matched))
+        best = order[0]
+        best_ratio = round(int(matched[best]) / len(search_words), 3)
+        if best_ratio > 0:
+            return int(self.ids[candidates[best]]), best_ratio
+        return None
@@ -0,0 +1,193 @@
+"""
+Stockage colonnaire binaire de la table CIQUAL, ouvert en mmap.
+
+`flask ciqual build-store` convertit ciqual.csv (tous les nutriments, pas
+seulement les glucides) en un fichier compact : un tableau float32 par
+nutriment, une table d'offsets pour les noms, et les ids de mots
+précalculés pour le matching. Chaque worker l'ouvre avec mmap : les pages
+sont partagées par tous les processus via le cache du système, et l'index
+CIQUAL se construit sans relire la table ciqual_foods.
+
+Format (ordre natif, vérifié à l'ouverture) :
+    en-tête   HEADER puis (offset, taille) de chaque section de SECTIONS
+    sections  alignées sur 8 octets, nutriments rangés colonne par colonne
+"""
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from app.utils.ciqual_data import CIQUAL_CSV_PATH, GLUCIDES_KEY, read_ciqual_table
+
+MAGIC = b'CIQL'
+FORMAT_VERSION = 1
+CARBS_LABEL = ' '.join(GLUCIDES_KEY.split())
+
+# magic, format, ordre des octets, version du jeu CIQUAL, aliments, nutriments, mots
+HEADER = struct.Struct('=4sIIIIII')
+BYTE_ORDER_MARK = 0x01020304
+SECTIONS = (
+    ('ids', 'I'),              # id CiqualFood, croissant
+    ('codes', 'I'),            # code CIQUAL (alim_code)
+    ('transformed', 'B'),
+    ('name_offsets', 'I'),     # n + 1 offsets dans 'names'
+    ('names', 'B'),            # noms UTF-8 concaténés
+    ('word_offsets', 'I'),     # vocabulaire : m + 1 offsets dans 'words'
+    ('words', 'B'),
+    ('token_offsets', 'I'),    # n + 1 offsets dans 'tokens'
+    ('tokens', 'I'),           # ids de mots de chaque aliment
+    ('label_offsets', 'I'),
+    ('labels', 'B'),           # libellés des nutriments
+    ('nutrients', 'f'),        # k colonnes de n float32, NaN = non mesuré
+)
+SECTION_TABLE = struct.Struct('=' + 'QQ' * len(SECTIONS))
+
+
+def _packed_strings(strings):
+    offsets, blob = array('I', [0]), bytearray()
+    for s in strings:
+        blob += s.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, array('B', blob)
+
+
+def write_ciqual_store(path, foods, labels, version=None):
+    """foods : [(id, code, nom, tokens, transformé, [valeurs ou None])].
+    Le fichier est écrit à côté puis renommé : les processus qui ont déjà
+    ouvert l'ancienne version la conservent jusqu'à leur prochain rechargement."""
+    foods = sorted(foods, key=lambda f: f[0])
+    vocab = sorted({word for f in foods for word in f[3].split()})
+    word_ids = {word: i for i, word in enumerate(vocab)}
+
+    token_offsets, tokens = array('I', [0]), array('I')
+    for food in foods:
+        tokens.extend(word_ids[w] for w in food[3].split())
+        token_offsets.append(len(tokens))
+
+    nutrients = array('f')
+    for col in range(len(labels)):
+        nutrients.extend(math.nan if f[5][col] is None else f[5][col] for f in foods)
+
+    name_offsets, names = _packed_strings(f[2] for f in foods)
+    word_offsets, words = _packed_strings(vocab)
+    label_offsets, label_blob = _packed_strings(labels)
+    data = {
+        'ids': array('I', (f[0] for f in foods)),
+        'codes': array('I', (f[1] for f in foods)),
+        'transformed': array('B', (bool(f[4]) for f in foods)),
+        'name_offsets': name_offsets, 'names': names,
+        'word_offsets': word_offsets, 'words': words,
+        'token_offsets': token_offsets, 'tokens': tokens,
+        'label_offsets': label_offsets, 'labels': label_blob,
+        'nutrients': nutrients,
+    }
+
+    table, offset = [], HEADER.size + SECTION_TABLE.size
+    for name, _ in SECTIONS:
+        offset += -offset % 8
+        size = len(data[name]) * data[name].itemsize
+        table += [offset, size]
+        offset += size
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK, version or 0,
+                            len(foods), len(labels), len(vocab)))
+        f.write(SECTION_TABLE.pack(*table))
+        for i, (name, _) in enumerate(SECTIONS):
+            f.write(b'\0' * (table[2 * i] - f.tell()))
+            data[name].tofile(f)
+    os.replace(tmp_path, path)
+    return len(foods)
+
+
+def build_ciqual_store(path, db_rows, version=None, csv_path=CIQUAL_CSV_PATH):
+    """Construit le fichier à partir du CSV (nutriments) et des lignes
+    ciqual_foods (id, code CIQUAL, nom, tokens, transformé), appariées par
+    code CIQUAL : un aliment absent du CSV signifie que la base n'a pas été
+    chargée depuis ce fichier."""
+    labels, csv_foods = read_ciqual_table(csv_path)
+    values_by_code = {code: values for code, _, values in csv_foods}
+    foods = []
+    for food_id, code, name, tokens, transformed in db_rows:
+        if code not in values_by_code:
+            raise ValueError(f"Aliment #{food_id} « {name} » absent de "
+                             f"{os.path.basename(csv_path)} : relancez flask ciqual load")
+        foods.append((food_id, code, name, tokens or '', transformed, values_by_code[code]))
+    return write_ciqual_store(path, foods, labels, version)
+
+
+class CiqualStore:
+    """Lecture du fichier : tout est servi depuis le mmap, rien n'est copié
+    à l'ouverture."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        magic, fmt, bom, version, n_foods, n_labels, n_words = HEADER.unpack_from(buf)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} : format de stockage CIQUAL inconnu")
+        if bom != BYTE_ORDER_MARK:
+            raise ValueError(f"{path} : fichier construit sur une machine {sys.byteorder} différente")
+        self.version = version or None
+        self.n_foods, self.n_labels = n_foods, n_labels
+
+        table = SECTION_TABLE.unpack_from(buf, HEADER.size)
+        for i, (name, fmt_char) in enumerate(SECTIONS):
+            offset, size = table[2 * i], table[2 * i + 1]
+            setattr(self, f'_{name}', buf[offset:offset + size].cast(fmt_char))
+
+        self.labels = [self._string(self._labels, self._label_offsets, i) for i in range(n_labels)]
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self._vocab = [self._string(self._words, self._word_offsets, i) for i in range(n_words)]
+
+    @staticmethod
+    def _string(blob, offsets, i):
+        return bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def __len__(self):
+        return self.n_foods
+
+    def close(self):
+        for name, _ in SECTIONS:
+            getattr(self, f'_{name}').release()
+        self._mmap.close()
+
+    def position(self, food_id):
+        """Position de l'aliment dans les colonnes, ou None."""
+        i = bisect_left(self._ids, food_id)
+        return i if i < self.n_foods and self._ids[i] == food_id else None
+
+    def name(self, i):
+        return self._string(self._names, self._name_offsets, i)
+
+    def tokens(self, i):
+        return ' '.join(self._vocab[w] for w in self._tokens[self._token_offsets[i]:self._token_offsets[i + 1]])
+
+    def column(self, label):
+        """Valeurs pour 100 g d'un nutriment (vue float32 sur le mmap, NaN = non mesuré)."""
+        j = self._label_index[label]
+        return self._nutrients[j * self.n_foods:(j + 1) * self.n_foods]
+
+    def value(self, i, label):
+        v = self._nutrients[self._label_index[label] * self.n_foods + i]
+        # float32 -> décimale d'origine (les valeurs CIQUAL ont au plus 6 chiffres)
+        return None if math.isnan(v) else float('%.6g' % v)
+
+    def nutrients(self, food_id):
+        """{libellé: valeur pour 100 g ou None} d'un aliment, ou None s'il est inconnu."""
+        i = self.position(food_id)
+        if i is None:
+            return None
+        return {label: self.value(i, label) for label in self.labels}
+
+    def index_rows(self):
+        """Lignes au format de CiqualIndex.from_db (glucides inconnus -> 0.0)."""
+        for i in range(self.n_foods):
+            carbs = self.value(i, CARBS_LABEL)
+            yield (self._ids[i], self.name(i), carbs if carbs is not None else 0.0,
+                   self.tokens(i), bool(self._transformed[i]))
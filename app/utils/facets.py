@@ -0,0 +1,115 @@
+"""
+Compteurs de la barre de filtres de l'index (familles, difficultés, tags,
+favoris, temps max, glucides par part).
+
+Tous les compteurs d'un utilisateur sont calculés par une seule requête
+(UNION ALL d'agrégats), puis gardés en mémoire par worker. Les routes qui
+créent, modifient ou suppriment des recettes appellent invalidate_facets() ;
+FACET_CACHE_TTL borne le retard des autres workers.
+"""
+import threading
+import time
+from flask import current_app
+from sqlalchemy import String, and_, cast, func, literal, select, union_all
+from app import db
+from app.models import Recipe, Tag, recipe_tags
+
+# Seuils du filtre « Temps max » de l'index (minutes)
+TIME_BUCKETS = (15, 30, 45, 60)
+# Tranches du filtre « Glucides par part » : clé -> (min inclus, max exclu) en g
+CARB_RANGES = {
+    'lt15': (None, 15),
+    '15-30': (15, 30),
+    '30-45': (30, 45),
+    'gte45': (45, None),
+}
+
+
+def carb_range_filter(key):
+    """Conditions sur Recipe.carbs_per_serving pour une tranche, ou None."""
+    if key not in CARB_RANGES:
+        return None
+    low, high = CARB_RANGES[key]
+    conditions = []
+    if low is not None:
+        conditions.append(Recipe.carbs_per_serving >= low)
+    if high is not None:
+        conditions.append(Recipe.carbs_per_serving < high)
+    return and_(*conditions)
+
+_cache = {}
+# Incrémenté à chaque invalidation : un calcul commencé avant n'est pas gardé
+_generations = {}
+_cache_lock = threading.Lock()
+
+
+def _facet_rows(user_id):
+    mine = Recipe.user_id == user_id
+
+    def grouped(facet, column, *where):
+        value = cast(column, String)
+        return select(literal(facet).label('facet'), value.label('value'),
+                      func.count().label('n')).where(mine, *where).group_by(value)
+
+    def counted(facet, *where):
+        return select(literal(facet).label('facet'), cast(literal(None), String).label('value'),
+                      func.count().label('n')).where(mine, *where)
+
+    statement = union_all(
+        counted('total'),
+        counted('favorites', Recipe.is_favorite == True),  # noqa: E712
+        grouped('category', Recipe.category),
+        grouped('difficulty', Recipe.difficulty),
+        *(counted(f'time:{minutes}', Recipe.total_time <= minutes) for minutes in TIME_BUCKETS),
+        *(counted(f'carbs:{key}', carb_range_filter(key)) for key in CARB_RANGES),
+        select(literal('tag'), cast(Tag.name, String), func.count())
+        .select_from(recipe_tags)
+        .join(Tag, Tag.id == recipe_tags.c.tag_id)
+        .join(Recipe, Recipe.id == recipe_tags.c.recipe_id)
+        .where(mine).group_by(Tag.name),
+    )
+    return db.session.execute(statement).all()
+
+
+def compute_facets(user_id):
+    facets = {'total': 0, 'favorites': 0, 'categories': {}, 'difficulties': {},
+              'max_time': {minutes: 0 for minutes in TIME_BUCKETS},
+              'carbs': {key: 0 for key in CARB_RANGES}, 'tags': {}}
+    for facet, value, n in _facet_rows(user_id):
+        if facet in ('total', 'favorites'):
+            facets[facet] = n
+        elif facet.startswith('time:'):
+            facets['max_time'][int(facet[5:])] = n
+        elif facet.startswith('carbs:'):
+            facets['carbs'][facet[6:]] = n
+        elif facet == 'category' and value:
+            facets['categories'][value] = n
+        elif facet == 'difficulty' and value:
+            facets['difficulties'][value] = n
+        elif facet == 'tag':
+            facets['tags'][value] = n
+    facets['tags'] = dict(sorted(facets['tags'].items()))
+    return facets
+
+
+def get_facets(user_id):
+    """Compteurs de l'utilisateur, depuis le cache tant qu'il est frais."""
+    ttl = current_app.config.get('FACET_CACHE_TTL', 300)
+    cached = _cache.get(user_id)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    generation = _generations.get(user_id, 0)
+    facets = compute_facets(user_id)
+    with _cache_lock:
+        if _generations.get(user_id, 0) == generation:
+            _cache[user_id] = (time.monotonic(), facets)
+    return facets
+
+
+def invalidate_facets(user_id):
+    """À appeler après le commit d'une création, modification ou suppression
+    de recettes de l'utilisateur."""
+    with _cache_lock:
+        _cache.pop(user_id, None)
+        _generations[user_id] = _generations.get(user_id, 0) + 1
@@ -0,0 +1,38 @@
+"""
+Validateurs HTTP (ETag, Last-Modified) des pages et de l'API d'une recette.
+
+La version d'une recette est sa ligne (id, updated_at) : toute écriture de
+ses lignes enfants (ingrédients, étapes, tags, détail des glucides) passe
+par la modification de la recette ou par `flask carbs recompute`, qui datent
+aussi la recette. Les ids des enfants ne suffiraient pas : SQLite réattribue
+le plus grand rowid libéré. Une requête conditionnelle (If-None-Match,
+If-Modified-Since) sur une version inchangée reçoit un 304 avant le
+chargement des relations.
+"""
+import hashlib
+from flask import Response, request
+from werkzeug.http import is_resource_modified
+
+
+def recipe_etag(recipe, *extra):
+    """ETag d'une recette (id, updated_at) ; `extra` ajoute ce dont dépend
+    en plus la réponse."""
+    parts = (recipe.id, recipe.updated_at.isoformat() if recipe.updated_at else None, *extra)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def not_modified(etag, last_modified=None, weak=False):
+    """Réponse 304 si la requête conditionnelle désigne déjà cette version,
+    sinon None (la route construit alors la réponse complète)."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(Response(status=304), etag, last_modified, weak)
+
+
+def with_validators(response, etag, last_modified=None, weak=False, public=False):
+    """Ajoute ETag et Last-Modified ; le client revalide à chaque affichage."""
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = f"{'public' if public else 'private'}, no-cache"
+    return response
@@ -0,0 +1,68 @@
+"""
+Fournisseur JSON de l'application (jsonify, request.get_json, |tojson).
+
+Avec JSON_ENCODER = 'orjson' (défaut) et orjson installé, la sérialisation
+passe par orjson ; sinon par le module json de la bibliothèque standard,
+avec un résultat équivalent (clés triées, dates au format HTTP).
+"""
+import json
+import logging
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider dont l'encodeur peut être orjson."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = app.config.get('JSON_ENCODER', 'orjson') == 'orjson'
+        if self.use_orjson and orjson is None:
+            logger.warning("orjson indisponible : sérialisation JSON standard utilisée")
+            self.use_orjson = False
+
+    def _orjson_options(self, indent=False, sort_keys=None):
+        # Les dates passent par self.default, comme avec json (format HTTP)
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        # sort_keys (passé par |tojson) a son équivalent orjson ; pour les
+        # options propres à json (indent=4, cls...), on laisse faire json
+        if not self.use_orjson or kwargs.keys() - {'sort_keys'}:
+            return super().dumps(obj, **kwargs)
+        options = self._orjson_options(sort_keys=kwargs.get('sort_keys'))
+        return orjson.dumps(obj, default=self.default, option=options).decode()
+
+    def loads(self, s, **kwargs):
+        if not self.use_orjson or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def dumps_bytes(self, obj, indent=False):
+        """JSON en UTF-8, clés dans l'ordre d'origine (fichiers d'export,
+        lignes NDJSON) ; `indent` indente de 2 espaces."""
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default,
+                                option=self._orjson_options(indent, sort_keys=False))
+        return json.dumps(obj, default=self.default, ensure_ascii=False,
+                          indent=2 if indent else None).encode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default,
+                            option=self._orjson_options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -10,6 +10,8 @@ Pour un usage médical (dosage d'insuline), une balance de cuisine reste
 la référence la plus fiable. Tout ingrédient absent de cette table DOIT
 être saisi manuellement en grammes : ne jamais deviner.
 """
+import re
+from functools import lru_cache
 
 UNIT_TO_GRAMS_UNIVERSAL = {
     'g': 1.0,
@@ -56,21 +58,58 @@ UNIT_ALIASES = {
 PINCEE_GRAMS = 0.36  # approximation grossière, pas de source officielle
 
 
-def convert_to_grams(ingredient_name: str, qty: float, unit: str):
-    """Retourne le poids en grammes, ou None si non convertible fiablement."""
+# ── MATCHER PRÉCOMPILÉ (construit à l'import) ────────────────
+# Unités normalisées -> unité canonique de INGREDIENT_WEIGHTS
+_UNIT_TABLE = {alias.strip().lower(): unit for alias, unit in UNIT_ALIASES.items()}
+
+# Mots-clés du plus long au plus court : « sucre glace » l'emporte sur
+# « sucre » quel que soit l'ordre du dictionnaire. Le lookahead permet de
+# relever les correspondances qui se chevauchent.
+_KEYWORDS_BY_LENGTH = sorted(INGREDIENT_WEIGHTS, key=len, reverse=True)
+_KEYWORD_RE = re.compile(
+    '(?=(' + '|'.join(re.escape(kw) for kw in _KEYWORDS_BY_LENGTH) + '))')
+
+
+@lru_cache(maxsize=4096)
+def grams_per_unit(ingredient_name, unit):
+    """Poids en grammes d'une unité de cet ingrédient, ou None."""
     unit_norm = (unit or '').strip().lower()
-    name_norm = (ingredient_name or '').strip().lower()
 
     if unit_norm in UNIT_TO_GRAMS_UNIVERSAL:
-        return qty * UNIT_TO_GRAMS_UNIVERSAL[unit_norm]
+        return UNIT_TO_GRAMS_UNIVERSAL[unit_norm]
 
     if unit_norm == 'pincée':
-        return qty * PINCEE_GRAMS
+        return PINCEE_GRAMS
 
-    if unit_norm in UNIT_ALIASES:
-        for keyword, weights in INGREDIENT_WEIGHTS.items():
-            if keyword in name_norm and unit_norm in weights:
-                return qty * weights[unit_norm]
+    canonical = _UNIT_TABLE.get(unit_norm)
+    if canonical is None:
         return None
 
-    return None
\ No newline at end of file
+    name_norm = (ingredient_name or '').strip().lower()
+    keywords = sorted({m.group(1) for m in _KEYWORD_RE.finditer(name_norm)},
+                      key=len, reverse=True)
+    for keyword in keywords:
+        weights = INGREDIENT_WEIGHTS[keyword]
+        if canonical in weights:
+            return weights[canonical]
+    return None
+
+
+def convert_to_grams(ingredient_name: str, qty: float, unit: str):
+    """Retourne le poids en grammes, ou None si non convertible fiablement."""
+    factor = grams_per_unit(ingredient_name, unit)
+    return qty * factor if factor is not None else None
+
+
+def convert_many(items):
+    """Version par lot de convert_to_grams pour une liste de (nom, qté, unité).
+    Chaque couple (nom, unité) distinct n'est résolu qu'une fois."""
+    factors = {}
+    results = []
+    for name, qty, unit in items:
+        key = (name, unit)
+        if key not in factors:
+            factors[key] = grams_per_unit(name, unit)
+        factor = factors[key]
+        results.append(qty * factor if factor is not None else None)
+    return results
@@ -0,0 +1,135 @@
+"""
+Pagination par curseur (keyset).
+
+La page suivante reprend juste après la dernière ligne affichée
+(WHERE clé de tri > dernière valeur) au lieu de sauter N lignes avec OFFSET,
+et aucun COUNT(*) n'est exécuté : une page profonde coûte autant que la
+première. Le curseur, opaque et signé, contient le nom du tri et les valeurs
+des clés de la ligne de bord.
+"""
+import json
+from datetime import datetime
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import Select, and_, func, or_, select
+from app import db
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total_estimate=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total_estimate = total_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keyset-cursor')
+
+
+def encode_cursor(name, values):
+    values = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return _serializer().dumps([name, values])
+
+
+def decode_cursor(cursor, name):
+    """Valeurs des clés, ou None si le curseur est invalide ou issu d'un autre tri."""
+    try:
+        cursor_name, values = _serializer().loads(cursor)
+        if cursor_name != name:
+            return None
+        return [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in values]
+    except (BadSignature, ValueError, TypeError, KeyError):
+        return None
+
+
+def _beyond(keys, values):
+    """Lignes strictement au-delà de `values` dans l'ordre de `keys` :
+    (k1 > v1) OU (k1 = v1 ET k2 > v2) OU ..., le sens suivant chaque clé."""
+    clauses = []
+    for i, ((expr, descending), value) in enumerate(zip(keys, values)):
+        equal_prefix = [k == v for (k, _), v in zip(keys[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, expr < value if descending else expr > value))
+    return or_(*clauses)
+
+
+def _fetch_all(query):
+    """Lignes d'une Query ORM ou d'un select() Core."""
+    if isinstance(query, Select):
+        return db.session.execute(query).all()
+    return query.all()
+
+
+def _width(query):
+    """Nombre de colonnes sélectionnées par la requête."""
+    if isinstance(query, Select):
+        return len(query.selected_columns)
+    return len(query.column_descriptions)
+
+
+def estimate_count(query):
+    """Nombre approximatif de lignes d'une requête : estimation du planificateur
+    sous PostgreSQL (aucune ligne lue), COUNT exact ailleurs."""
+    query = query.order_by(None)
+    statement = query if isinstance(query, Select) else query.statement
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return db.session.execute(select(func.count()).select_from(statement.subquery())).scalar()
+    compiled = statement.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def keyset_paginate(query, keys, name, per_page, after=None, before=None, with_count=False):
+    """Une page de `query` (Query ORM ou select() Core) triée par `keys` :
+    [(expression, décroissant)], la dernière clé devant être unique (l'id).
+    `after` / `before` sont les curseurs de la page suivante / précédente ;
+    `with_count` ajoute une estimation du nombre total de lignes.
+
+    Les éléments sont les objets de la requête ou, quand elle sélectionne
+    plusieurs colonnes, ses lignes (Row, suivies des colonnes keyset_N)."""
+    total_estimate = estimate_count(query) if with_count else None
+
+    after_values = decode_cursor(after, name) if after else None
+    before_values = decode_cursor(before, name) if before and not after_values else None
+    backward = before_values is not None
+    if backward:
+        # On parcourt à l'envers depuis le bord, puis on remet la page à l'endroit
+        keys_used = [(expr, not descending) for expr, descending in keys]
+        query = query.filter(_beyond(keys_used, before_values))
+    else:
+        keys_used = keys
+        if after_values:
+            query = query.filter(_beyond(keys, after_values))
+
+    query = query.order_by(None).order_by(
+        *(expr.desc() if descending else expr.asc() for expr, descending in keys_used))
+    width = _width(query)
+    rows = _fetch_all(query.add_columns(
+        *(expr.label(f'keyset_{i}') for i, (expr, _) in enumerate(keys))
+    ).limit(per_page + 1))
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+
+    items = [row[0] if width == 1 else row for row in rows]
+    first = encode_cursor(name, list(rows[0][width:])) if rows else None
+    last = encode_cursor(name, list(rows[-1][width:])) if rows else None
+    if backward:
+        return KeysetPage(items, next_cursor=last, prev_cursor=first if has_more else None,
+                          total_estimate=total_estimate)
+    return KeysetPage(items, next_cursor=last if has_more else None,
+                      prev_cursor=first if after_values else None,
+                      total_estimate=total_estimate)
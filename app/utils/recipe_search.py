@@ -0,0 +1,106 @@
+"""
+Recherche plein texte des recettes.
+
+PostgreSQL : colonne générée recipes.search_vector (configuration 'french',
+accents retirés par unaccent, titre pondéré A et reste B), index GIN,
+classement par ts_rank. SQLite (développement local) : table virtuelle FTS5
+recipes_fts sans accents, classement par bm25. Autres bases : ILIKE.
+
+Tout le texte hors titre (description, astuces, ingrédients, étapes, tags)
+est dénormalisé dans recipes.search_document par refresh_search_document(),
+à appeler à chaque enregistrement d'une recette.
+"""
+import re
+from sqlalchemy import DDL, Column, Integer, MetaData, Table, Text, event, func, literal_column, text
+from app import db
+from app.models import Recipe
+
+SEARCH_TERM_RE = re.compile(r'\w+')
+MAX_SEARCH_TERMS = 10
+
+PG_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() n'est pas IMMUTABLE : l'enveloppe l'est, pour la colonne générée
+    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS "
+    "$$ SELECT public.unaccent('public.unaccent', $1) $$ "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+    "ALTER TABLE recipes ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('french', f_unaccent(coalesce(title, ''))), 'A') || "
+    "setweight(to_tsvector('french', f_unaccent(coalesce(search_document, ''))), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS ix_recipes_search_vector ON recipes USING gin (search_vector)",
+)
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5("
+    "title, body, tokenize = 'unicode61 remove_diacritics 2')",
+)
+
+# Hors de db.metadata : créée par SQLITE_SEARCH_DDL, jamais par create_all()
+recipes_fts = Table('recipes_fts', MetaData(),
+                    Column('rowid', Integer, primary_key=True),
+                    Column('title', Text), Column('body', Text))
+
+# Bases créées par db.create_all() ; les bases existantes passent par la migration
+for _statement in PG_SEARCH_DDL:
+    event.listen(Recipe.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Recipe.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+
+def build_search_document(description, tips, ingredient_names, step_texts, tag_names):
+    parts = [description, tips, *ingredient_names, *step_texts, *tag_names]
+    return ' '.join(p.strip() for p in parts if p and p.strip())
+
+
+def refresh_search_document(recipe):
+    """Recalcule le texte indexé d'une recette, après l'enregistrement de ses
+    ingrédients, étapes et tags et avant le commit."""
+    recipe.search_document = build_search_document(
+        recipe.description, recipe.tips,
+        [i.name for i in recipe.ingredients],
+        [s.instruction for s in recipe.steps],
+        [t.name for t in recipe.tags],
+    )
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.flush()
+        db.session.execute(recipes_fts.delete().where(recipes_fts.c.rowid == recipe.id))
+        db.session.execute(recipes_fts.insert().values(
+            rowid=recipe.id, title=recipe.title, body=recipe.search_document))
+
+
+@event.listens_for(Recipe, 'after_delete')
+def _drop_fts_row(mapper, connection, target):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(recipes_fts.delete().where(recipes_fts.c.rowid == target.id))
+
+
+def search_terms(search):
+    return [t for t in SEARCH_TERM_RE.findall(search.lower()) if len(t) > 1][:MAX_SEARCH_TERMS]
+
+
+def apply_search(query, search):
+    """Filtre une requête sur Recipe : chaque mot doit apparaître, en début de
+    mot (« choco » trouve « chocolats »). Retourne (requête, pertinence),
+    la pertinence étant une expression à trier par ordre décroissant, ou None."""
+    terms = search_terms(search)
+    if not terms:
+        return query, None
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        tsquery = func.to_tsquery('french', func.f_unaccent(' & '.join(f'{t}:*' for t in terms)))
+        vector = literal_column('recipes.search_vector')
+        return query.filter(vector.op('@@')(tsquery)), func.ts_rank(vector, tsquery)
+
+    if dialect == 'sqlite':
+        fts = literal_column('recipes_fts')
+        query = query.join(recipes_fts, recipes_fts.c.rowid == Recipe.id)\
+            .filter(fts.match(' '.join(f'"{t}"*' for t in terms)))
+        # bm25 : plus petit = plus pertinent ; le titre compte 10 fois plus
+        return query, -func.bm25(fts, 10.0, 1.0)
+
+    for term in terms:
+        query = query.filter(db.or_(Recipe.title.ilike(f'%{term}%'),
+                                    Recipe.search_document.ilike(f'%{term}%')))
+    return query, None
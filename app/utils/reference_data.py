@@ -0,0 +1,78 @@
+"""
+Données de référence de l'utilisateur connecté (familles, tags), mémorisées
+le temps d'une requête dans flask.g.
+
+La route, ses formulaires et le menu de base.html (get_all_categories)
+partagent ainsi une seule requête SQL par table. Les routes qui créent,
+renomment ou suppriment une famille appellent invalidate_user_categories() ;
+les tags ne sont créés que par get_or_create_tag(), qui complète le cache
+lui-même. Un commit ou un rollback vide aussi le cache, les objets
+mémorisés étant alors expirés par la session.
+"""
+from flask import g, has_app_context
+from flask_login import current_user
+from sqlalchemy import event
+from app import db
+from app.models import Category, Tag
+
+_CACHE_ATTR = 'reference_data'
+
+
+def _memoized(key, loader):
+    cache = g.setdefault(_CACHE_ATTR, {})
+    key = (key, current_user.id)
+    if key not in cache:
+        cache[key] = loader()
+    return cache[key]
+
+
+def _invalidate(key):
+    cache = g.get(_CACHE_ATTR) if has_app_context() else None
+    if cache:
+        for cached_key in [k for k in cache if k[0] == key]:
+            del cache[cached_key]
+
+
+def get_user_categories():
+    """Familles de l'utilisateur, triées par nom ([] si anonyme)."""
+    if not current_user.is_authenticated:
+        return []
+    return _memoized('categories', lambda: Category.query.filter_by(
+        user_id=current_user.id).order_by(Category.name).all())
+
+
+def get_user_category_names():
+    return [c.name for c in get_user_categories()]
+
+
+def get_user_tags():
+    """{nom: Tag} des tags de l'utilisateur ({} si anonyme)."""
+    if not current_user.is_authenticated:
+        return {}
+    return _memoized('tags', lambda: {t.name: t for t in Tag.query.filter_by(
+        user_id=current_user.id).order_by(Tag.name)})
+
+
+def get_or_create_tag(name):
+    """Tag `name` de l'utilisateur, ajouté à la session s'il n'existe pas."""
+    tags = get_user_tags()
+    tag = tags.get(name)
+    if tag is None:
+        tag = Tag(name=name, user_id=current_user.id)
+        db.session.add(tag)
+        # Le tag en attente reste visible pour la suite de la requête
+        tags[name] = tag
+    return tag
+
+
+def invalidate_user_categories():
+    _invalidate('categories')
+
+
+def _clear_reference_data(session, *args):
+    if has_app_context():
+        g.pop(_CACHE_ATTR, None)
+
+
+event.listen(db.session, 'after_commit', _clear_reference_data)
+event.listen(db.session, 'after_soft_rollback', _clear_reference_data)
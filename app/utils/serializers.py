@@ -0,0 +1,116 @@
+"""
+Représentations JSON des recettes construites depuis des tuples de lignes,
+sans instancier d'objets ORM.
+
+Le contenu est celui de Recipe.to_dict() : une requête pour les recettes,
+puis une par relation demandée (ingrédients, étapes, tags), quel que soit
+le nombre de recettes. Sert aux exports et aux listes de l'API ; voir
+benchmarks/bench_export.py pour le gain face aux objets ORM.
+"""
+from sqlalchemy import select
+from app import db
+from app.models import Recipe, Ingredient, Step, Tag, recipe_tags
+
+# Clés de Ingredient.to_dict() et Step.to_dict() -> colonnes
+INGREDIENT_COLUMNS = {
+    'id': Ingredient.id,
+    'name': Ingredient.name,
+    'quantity': Ingredient.quantity,
+    'unit': Ingredient.unit,
+    'weight_g': Ingredient.weight_g,
+    'carbs_g': Ingredient.carbs_g,
+    'matched_food': Ingredient.matched_food_name,
+}
+STEP_COLUMNS = {
+    'id': Step.id,
+    'order': Step.order,
+    'instruction': Step.instruction,
+    'duration': Step.duration,
+}
+
+
+def _children(recipe_ids, recipe_column, columns, order_by):
+    """(recipe_id, dict) des lignes enfants, dans l'ordre de la relation."""
+    keys = list(columns)
+    query = select(recipe_column, *columns.values())\
+        .where(recipe_column.in_(recipe_ids)).order_by(recipe_column, *order_by)
+    for recipe_id, *values in db.session.execute(query):
+        yield recipe_id, dict(zip(keys, values))
+
+
+def _attach_relations(payloads, recipe_ids, fields):
+    """Ajoute aux dicts {id: payload} les relations demandées, lues pour
+    les recettes de la sous-requête `recipe_ids`, puis rend la liste."""
+    relations = [r for r in Recipe.DICT_RELATIONS if r in fields]
+    if payloads and relations:
+        for payload in payloads.values():
+            payload.update((r, []) for r in relations)
+        if 'ingredients' in relations:
+            for recipe_id, item in _children(recipe_ids, Ingredient.recipe_id,
+                                             INGREDIENT_COLUMNS, (Ingredient.id,)):
+                payloads[recipe_id]['ingredients'].append(item)
+        if 'steps' in relations:
+            for recipe_id, item in _children(recipe_ids, Step.recipe_id, STEP_COLUMNS,
+                                             (Step.order, Step.id)):
+                payloads[recipe_id]['steps'].append(item)
+        if 'tags' in relations:
+            query = select(recipe_tags.c.recipe_id, Tag.name)\
+                .join(Tag, Tag.id == recipe_tags.c.tag_id)\
+                .where(recipe_tags.c.recipe_id.in_(recipe_ids))\
+                .order_by(recipe_tags.c.recipe_id, Tag.name)
+            for recipe_id, name in db.session.execute(query):
+                payloads[recipe_id]['tags'].append(name)
+
+    if 'id' not in fields:
+        for payload in payloads.values():
+            del payload['id']
+    return list(payloads.values())
+
+
+def _columns(fields):
+    # L'id sert à rattacher les enfants, même s'il n'est pas demandé
+    return [c for c in Recipe.DICT_COLUMNS if c in fields or c == 'id']
+
+
+def recipe_payloads(*criteria, fields=None, order_by=(Recipe.id,), limit=None):
+    """Dicts de Recipe.to_dict(fields) des recettes vérifiant `criteria`,
+    dans l'ordre `order_by` ; seules les relations demandées sont lues."""
+    if fields is None:
+        fields = Recipe.DICT_COLUMNS + Recipe.DICT_RELATIONS
+    columns = _columns(fields)
+    query = select(*(getattr(Recipe, c) for c in columns)).where(*criteria).order_by(*order_by)
+    if limit is not None:
+        query = query.limit(limit)
+
+    payloads = {row.id: dict(zip(columns, row)) for row in db.session.execute(query)}
+    # Sous-requête plutôt qu'une liste d'ids : pas de limite de paramètres
+    recipe_ids = query.with_only_columns(Recipe.id)
+    if limit is None:
+        recipe_ids = recipe_ids.order_by(None)
+    return _attach_relations(payloads, recipe_ids, fields)
+
+
+def owned_recipe_payloads(recipe_ids, user_id, fields=None):
+    """(dicts des recettes de `user_id` parmi `recipe_ids`, dans l'ordre
+    demandé ; ids des recettes d'autres utilisateurs).
+
+    Une seule requête sur recipes sépare les deux : les ids absents des deux
+    listes n'existent pas."""
+    if fields is None:
+        fields = Recipe.DICT_COLUMNS + Recipe.DICT_RELATIONS
+    columns = _columns(fields)
+    query = select(Recipe.user_id, *(getattr(Recipe, c) for c in columns))\
+        .where(Recipe.id.in_(recipe_ids))
+    rows, forbidden = {}, []
+    for owner, *values in db.session.execute(query):
+        payload = dict(zip(columns, values))
+        if owner == user_id:
+            rows[payload['id']] = payload
+        else:
+            forbidden.append(payload['id'])
+
+    position = {recipe_id: i for i, recipe_id in enumerate(recipe_ids)}
+    payloads = {recipe_id: rows[recipe_id] for recipe_id in sorted(rows, key=position.get)}
+    forbidden.sort(key=position.get)
+    owned = select(Recipe.id).where(Recipe.id.in_(recipe_ids), Recipe.user_id == user_id)
+    return _attach_relations(payloads, owned, fields), forbidden
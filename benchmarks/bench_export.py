@@ -0,0 +1,102 @@
+"""
+Banc d'essai de l'export JSON des recettes : objets ORM + to_dict() + json
+face aux tuples de lignes (utils/serializers.py) + encodeur de l'application.
+
+Crée une base SQLite en mémoire avec un utilisateur et 1 000 recettes (8
+ingrédients, 5 étapes, 2 tags chacune), vérifie que les deux chemins
+produisent le même contenu, puis mesure chacun (médiane de plusieurs
+passes, sérialisation comprise).
+
+    python benchmarks/bench_export.py               # échoue (code 1) si les contenus diffèrent
+    python benchmarks/bench_export.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Base jetable : jamais la base configurée
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from sqlalchemy.orm import selectinload  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Recipe, Ingredient, Step, Tag  # noqa: E402
+from app.utils.serializers import recipe_payloads  # noqa: E402
+
+RECIPES = 1000
+
+
+def seed():
+    user = User(username='bench', email='bench@example.com')
+    db.session.add(user)
+    db.session.flush()
+    tags = [Tag(name=f'tag{i}', user_id=user.id) for i in range(20)]
+    db.session.add_all(tags)
+    for i in range(RECIPES):
+        recipe = Recipe(user_id=user.id, title=f'Recette {i:04d}', description='Une recette de test. ' * 5,
+                        category='Gâteau', prep_time=i % 60, cook_time=20, servings=4,
+                        total_carbs=float(i % 200), tags=[tags[i % 20], tags[(i + 7) % 20]])
+        recipe.ingredients = [Ingredient(name=f'ingrédient {j}', quantity=j * 10.0, unit='g',
+                                         weight_g=j * 10.0, carbs_g=j * 1.5,
+                                         matched_food_name=f'Aliment {j}') for j in range(8)]
+        recipe.steps = [Step(order=j + 1, instruction=f'Étape {j + 1} : mélanger doucement.') for j in range(5)]
+        db.session.add(recipe)
+    db.session.commit()
+    return user.id
+
+
+def orm_export(user_id):
+    recipes = Recipe.query.filter_by(user_id=user_id).order_by(Recipe.id).options(
+        selectinload(Recipe.ingredients), selectinload(Recipe.steps), selectinload(Recipe.tags)).all()
+    data = [r.to_dict() for r in recipes]
+    return data, json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8')
+
+
+def row_export(app, user_id):
+    data = recipe_payloads(Recipe.user_id == user_id)
+    return data, app.json.dumps_bytes(data, indent=True)
+
+
+def measure(fn, runs):
+    timings = []
+    for _ in range(runs):
+        db.session.expunge_all()  # pas d'objets déjà chargés d'une passe à l'autre
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id = seed()
+
+        orm_data, _ = orm_export(user_id)
+        row_data, body = row_export(app, user_id)
+        if orm_data != row_data or json.loads(body) != row_data:
+            print("❌ Les exports ORM et par tuples diffèrent.")
+            return 1
+        encoder = 'orjson' if app.json.use_orjson else 'json'
+        print(f"✅ Contenus identiques ({len(row_data)} recettes, {len(body) // 1024} Ko)")
+
+        orm_time = measure(lambda: orm_export(user_id), args.runs)
+        row_time = measure(lambda: row_export(app, user_id), args.runs)
+        print(f"ORM + to_dict + json     : {orm_time * 1000:8.1f} ms")
+        print(f"tuples + {encoder:<16}: {row_time * 1000:8.1f} ms  (x{orm_time / row_time:.1f})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
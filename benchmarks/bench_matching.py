@@ -0,0 +1,256 @@
+"""
+Banc d'essai du calcul de glucides : matching CIQUAL + conversion en grammes.
+
+Charge app/static/data/ciqual.csv dans un index en mémoire (aucune base
+nécessaire), rejoue le fichier de référence matching_golden.csv sur chaque
+moteur de score et le compare à matching_baseline.json :
+
+- la justesse de référence est celle du matcher d'origine
+  (reference_matcher.py) : toute ligne qu'il résolvait correctement doit
+  l'être encore, et précision et rappel ne doivent pas baisser ;
+- chaque ligne dont les grammes étaient justes doit le rester ;
+- la latence p99 de chaque moteur est comparée à la sienne.
+
+Chaque moteur doit aussi choisir le même aliment que le matcher d'origine
+pour les ingrédients de référence et ceux de matching_parity.txt.
+
+    python benchmarks/bench_matching.py            # échoue (code 1) en cas de régression
+    python benchmarks/bench_matching.py --update   # enregistre la référence (matcher d'origine + latences)
+    python benchmarks/bench_matching.py -v         # détaille les écarts ligne par ligne
+
+Pour un usage médical, une baisse de précision ou de justesse des grammes
+n'est jamais acceptable : seule la latence dispose d'une marge (machines
+différentes).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SECRET_KEY', 'bench')  # exigée par config.py à l'import
+
+from app.utils.ciqual_data import read_ciqual_csv  # noqa: E402
+from app.utils.ciqual_matching import CiqualIndex, precompute_food_fields  # noqa: E402
+from app.utils.nutrition_conversion import convert_to_grams  # noqa: E402
+from reference_matcher import ReferenceMatcher  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(HERE, 'matching_golden.csv')
+BASELINE_PATH = os.path.join(HERE, 'matching_baseline.json')
+PARITY_PATH = os.path.join(HERE, 'matching_parity.txt')
+
+LATENCY_TOLERANCE = 3.0   # p99 autorisé jusqu'à 3x la référence
+GRAMS_TOLERANCE = 0.005   # 0,5 % d'écart relatif
+
+
+def backends():
+    found = {'python': CiqualIndex}
+    try:
+        from app.utils.ciqual_numpy import NumpyCiqualIndex
+        found['numpy'] = NumpyCiqualIndex
+    except ImportError:
+        pass
+    return found
+
+
+def load_golden(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f, delimiter=';'))
+    for row in rows:
+        row['qty'] = float(row['qty'])
+        row['expected_food'] = row['expected_food'] or None
+        row['expected_grams'] = float(row['expected_grams']) if row['expected_grams'] else None
+    return rows
+
+
+def load_parity(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def parity_failures(name, index, reference, queries):
+    """Requêtes pour lesquelles le moteur ne choisit pas l'aliment du
+    matcher d'origine."""
+    failures = []
+    for query in queries:
+        food = index.find(query)
+        predicted, expected = food.name if food else None, reference.find(query)
+        if predicted != expected:
+            failures.append(f"{name}: {query!r} -> {predicted!r} (origine {expected!r})")
+    return failures
+
+
+def index_rows(foods):
+    """Mêmes colonnes que CiqualIndex.from_db, ids dans l'ordre du chargement."""
+    rows = []
+    for food_id, (name, carbs) in enumerate(foods, start=1):
+        fields = precompute_food_fields(name)
+        rows.append((food_id, name, carbs, fields['tokens'], fields['is_transformed']))
+    return rows
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def grams_ok(expected, actual):
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    return abs(actual - expected) <= max(abs(expected) * GRAMS_TOLERANCE, 0.01)
+
+
+def match_accuracy(find_name, golden, verbose=False):
+    """Précision, rappel et lignes correctement résolues par find_name."""
+    tp = fp = fn = 0
+    foods_ok = []
+    for row in golden:
+        predicted = find_name(row['ingredient'])
+        expected = row['expected_food']
+        if predicted == expected:
+            tp += 1 if predicted else 0
+            foods_ok.append(row['ingredient'])
+        else:
+            if predicted:
+                fp += 1
+            if expected:
+                fn += 1
+            if verbose:
+                print(f"    ✗ {row['ingredient']!r} -> {predicted!r} (attendu {expected!r})")
+    return {
+        'precision': round(tp / (tp + fp), 4) if tp + fp else 0.0,
+        'recall': round(tp / (tp + fn), 4) if tp + fn else 0.0,
+        'foods_ok': foods_ok,
+    }
+
+
+def run_backend(index, golden, repeat, verbose):
+    result = match_accuracy(lambda name: getattr(index.find(name), 'name', None), golden, verbose)
+    result['grams_ok'] = []
+    for row in golden:
+        grams = convert_to_grams(row['ingredient'], row['qty'], row['unit'])
+        if grams_ok(row['expected_grams'], grams):
+            result['grams_ok'].append(row['ingredient'])
+        elif verbose:
+            print(f"    ✗ {row['qty']} {row['unit']} {row['ingredient']!r} -> "
+                  f"{grams} g (attendu {row['expected_grams']})")
+
+    timings = []
+    for _ in range(repeat):
+        for row in golden:
+            start = time.perf_counter()
+            index.find(row['ingredient'])
+            convert_to_grams(row['ingredient'], row['qty'], row['unit'])
+            timings.append((time.perf_counter() - start) * 1000)
+
+    result.update(
+        grams_accuracy=round(len(result['grams_ok']) / len(golden), 4),
+        p50_ms=round(percentile(timings, 50), 4),
+        p99_ms=round(percentile(timings, 99), 4),
+    )
+    return result
+
+
+def regressions(name, result, baseline):
+    """Écarts d'un moteur à la référence : métriques, puis ligne par ligne."""
+    failures = []
+    reference = baseline['reference']
+    for metric in ('precision', 'recall'):
+        if result[metric] < reference[metric]:
+            failures.append(f"{name}: {metric} {result[metric]} < {reference[metric]} (origine)")
+    for ingredient in reference['foods_ok']:
+        if ingredient not in result['foods_ok']:
+            failures.append(f"{name}: {ingredient!r} n'est plus résolu comme à l'origine")
+    for ingredient in baseline['grams_ok']:
+        if ingredient not in result['grams_ok']:
+            failures.append(f"{name}: grammes de {ingredient!r} incorrects")
+    latency = baseline['latency'].get(name)
+    if latency and result['p99_ms'] > latency['p99_ms'] * LATENCY_TOLERANCE:
+        failures.append(f"{name}: p99 {result['p99_ms']} ms > "
+                        f"{LATENCY_TOLERANCE} x {latency['p99_ms']} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--golden', default=GOLDEN_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--parity', default=PARITY_PATH)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--update', action='store_true',
+                        help="écrit les résultats comme nouvelle référence")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    rows = index_rows(read_ciqual_csv())
+    print(f"{len(rows)} aliments CIQUAL, {len(golden)} ingrédients de référence\n")
+    reference = ReferenceMatcher(rows)
+    parity_queries = [row['ingredient'] for row in golden] + load_parity(args.parity)
+
+    results = {}
+    failures = []
+    for name, index_class in backends().items():
+        start = time.perf_counter()
+        index = index_class(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"[{name}] index construit en {build_ms:.0f} ms")
+        results[name] = run_backend(index, golden, args.repeat, args.verbose)
+        r = results[name]
+        parity = parity_failures(name, index, reference, parity_queries)
+        failures += parity
+        print(f"  précision {r['precision']:.2%}  rappel {r['recall']:.2%}  "
+              f"grammes {r['grams_accuracy']:.2%}  "
+              f"p50 {r['p50_ms']:.3f} ms  p99 {r['p99_ms']:.3f} ms")
+        print(f"  parité avec le matcher d'origine : "
+              f"{len(parity_queries) - len(parity)}/{len(parity_queries)}\n")
+
+    if args.update and failures:
+        print("❌ Référence non enregistrée, écarts avec le matcher d'origine :")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    if args.update:
+        # Justesse : celle du matcher d'origine, jamais celle des moteurs
+        # mesurés ; grammes : lignes justes de la conversion actuelle
+        reference_result = match_accuracy(reference.find, golden)
+        grams_rows = set.intersection(*(set(r['grams_ok']) for r in results.values()))
+        baseline = {
+            'reference': reference_result,
+            'grams_ok': [row['ingredient'] for row in golden if row['ingredient'] in grams_rows],
+            'latency': {name: {'p50_ms': r['p50_ms'], 'p99_ms': r['p99_ms']}
+                        for name, r in results.items()},
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write('\n')
+        print(f"Référence mise à jour : {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Aucune référence : relancez avec --update pour l'enregistrer.")
+        return 1
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if 'reference' not in baseline:
+        print("Référence à l'ancien format : relancez avec --update pour l'enregistrer.")
+        return 1
+    for name, result in results.items():
+        failures += regressions(name, result, baseline)
+
+    if failures:
+        print("❌ Régressions :")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("✅ Aucune régression.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
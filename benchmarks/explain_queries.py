@@ -0,0 +1,111 @@
+"""
+Vérifie que les requêtes principales des routes passent par un index.
+
+Exécute EXPLAIN (PostgreSQL) ou EXPLAIN QUERY PLAN (SQLite) sur la base
+configurée (DATABASE_URL) et contrôle que chaque plan cite l'index attendu.
+Sous PostgreSQL, les parcours séquentiels sont désactivés le temps du
+contrôle : sur une petite base de développement le planificateur les
+préférerait, alors qu'on veut savoir si l'index est utilisable.
+
+    python benchmarks/explain_queries.py       # échoue (code 1) si un index n'est pas utilisé
+    python benchmarks/explain_queries.py -v    # affiche les plans
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import select  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import (Recipe, Ingredient, Step, Category, Tag,  # noqa: E402
+                        CookingHistory, recipe_tags)
+
+
+def checked_queries(user_id=1, recipe_id=1, tag_id=1):
+    """(description, requête, index attendu), à l'image des routes."""
+    return [
+        ("index : recettes récentes",
+         select(Recipe.id).where(Recipe.user_id == user_id)
+         .order_by(Recipe.created_at.desc(), Recipe.id.desc()).limit(10),
+         'ix_recipes_user_created'),
+        ("index : recettes A-Z",
+         select(Recipe.id).where(Recipe.user_id == user_id)
+         .order_by(Recipe.title, Recipe.id).limit(10),
+         'ix_recipes_user_title'),
+        ("index : temps max, recettes rapides",
+         select(Recipe.id).where(Recipe.user_id == user_id, Recipe.total_time <= 30)
+         .order_by(Recipe.total_time, Recipe.id).limit(10),
+         'ix_recipes_user_total_time'),
+        ("index : glucides par part",
+         select(Recipe.id).where(Recipe.user_id == user_id, Recipe.carbs_per_serving < 15)
+         .order_by(Recipe.carbs_per_serving, Recipe.id).limit(10),
+         'ix_recipes_user_carbs_per_serving'),
+        ("détail : ingrédients",
+         select(Ingredient.id).where(Ingredient.recipe_id == recipe_id),
+         'ix_ingredients_recipe_id'),
+        ("détail : étapes",
+         select(Step.id).where(Step.recipe_id == recipe_id).order_by(Step.order),
+         'ix_steps_recipe_order'),
+        ("tag : recettes du tag",
+         select(recipe_tags.c.recipe_id).where(recipe_tags.c.tag_id == tag_id),
+         'ix_recipe_tags_tag_id'),
+        ("édition : tag par nom",
+         select(Tag.id).where(Tag.user_id == user_id, Tag.name == 'dessert'),
+         'uq_tags_user_name'),
+        ("formulaires : catégories",
+         select(Category.name).where(Category.user_id == user_id).order_by(Category.name),
+         'uq_categories_user_name'),
+        ("historique",
+         select(CookingHistory.id).where(CookingHistory.user_id == user_id)
+         .order_by(CookingHistory.cooked_at.desc()),
+         'ix_cooking_history_user_cooked'),
+    ]
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    if connection.dialect.name == 'postgresql':
+        rows = connection.exec_driver_sql(f'EXPLAIN {compiled}', compiled.params)
+        return '\n'.join(row[0] for row in rows)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params)
+    return '\n'.join(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app()
+    failures = []
+    with app.app_context(), db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SET enable_seqscan = off')
+        elif connection.dialect.name != 'sqlite':
+            print(f"Base {connection.dialect.name} non prise en charge.")
+            return 1
+
+        for label, statement, index_name in checked_queries():
+            plan = explain(connection, statement)
+            # SQLite nomme l'index d'une contrainte unique sqlite_autoindex_<table>_N
+            table = statement.get_final_froms()[0].name
+            used = index_name in plan or (
+                index_name.startswith('uq_') and f'sqlite_autoindex_{table}_' in plan)
+            print(f"{'✅' if used else '❌'} {label} ({index_name})")
+            if args.verbose or not used:
+                print('    ' + plan.replace('\n', '\n    '))
+            if not used:
+                failures.append(label)
+
+    if failures:
+        print(f"\n❌ {len(failures)} requête(s) sans index.")
+        return 1
+    print("\n✅ Toutes les requêtes utilisent leur index.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
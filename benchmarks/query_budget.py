@@ -0,0 +1,138 @@
+"""
+Vérifie le nombre de requêtes SQL des routes de liste.
+
+Crée une base SQLite en mémoire, un utilisateur avec 500 recettes (5
+ingrédients, 4 étapes, 2 tags chacune) et un historique, puis appelle chaque
+route et compare le nombre de requêtes exécutées à son budget. Un budget
+dépassé signale un chargement paresseux dans une boucle (N+1). Les pages
+d'une recette sont aussi revalidées (If-None-Match) : le 304 doit être
+servi sans charger les relations.
+
+    python benchmarks/query_budget.py       # échoue (code 1) si un budget est dépassé
+    python benchmarks/query_budget.py -v    # affiche les requêtes des routes en échec
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Base jetable : jamais la base configurée
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('SECRET_KEY', 'query-budget')
+
+from sqlalchemy import event  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Recipe, Ingredient, Step, Tag, CookingHistory  # noqa: E402
+
+RECIPES = 500
+EMAIL, PASSWORD = 'budget@example.com', 'Budget-Passw0rd'
+
+
+def seed():
+    user = User(username='budget', email=EMAIL)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.flush()
+    tags = [Tag(name=f'tag{i}', user_id=user.id) for i in range(10)]
+    db.session.add_all(tags)
+    recipes = []
+    for i in range(RECIPES):
+        recipe = Recipe(user_id=user.id, title=f'Recette {i:03d}', category='Gâteau',
+                        prep_time=i % 60, cook_time=10, servings=4, total_carbs=i % 200,
+                        tags=[tags[i % 10], tags[(i + 1) % 10]])
+        recipe.ingredients = [Ingredient(name=f'ingrédient {j}', quantity=j + 1, unit='g') for j in range(5)]
+        recipe.steps = [Step(order=j + 1, instruction=f'Étape {j + 1}') for j in range(4)]
+        recipes.append(recipe)
+    db.session.add_all(recipes)
+    db.session.flush()
+    db.session.add_all(CookingHistory(user_id=user.id, recipe_id=r.id) for r in recipes[:100])
+    db.session.commit()
+    return [r.id for r in recipes]
+
+
+def routes(recipe_ids):
+    """(description, méthode, url, arguments de client.open, budget)."""
+    selected = ','.join(str(i) for i in recipe_ids[:100])
+    batch = recipe_ids[:99] + [0]  # 0 : id inexistant
+    return [
+        ("index", 'GET', '/', None, 6),
+        ("index, tri glucides", 'GET', '/?sort=carbs_asc&carbs=15-30', None, 6),
+        ("toutes les recettes", 'GET', '/all-recipes', None, 3),
+        ("toutes les recettes, données", 'GET', '/api/all-recipes', None, 3),
+        ("détail", 'GET', f'/recipe/{recipe_ids[0]}', None, 10),
+        ("édition", 'GET', f'/recipe/{recipe_ids[0]}/edit', None, 7),
+        ("recettes d'un tag", 'GET', '/tag/tag1', None, 5),
+        ("historique", 'GET', '/history', None, 3),
+        ("API recettes", 'GET', '/api/recipes', None, 5),
+        ("API recettes, champs", 'GET', '/api/recipes?fields=title,tags&limit=100', None, 3),
+        ("API compteurs", 'GET', '/api/facets', None, 2),
+        ("export", 'GET', '/admin/export', None, 5),
+        ("liste de courses", 'POST', '/shopping-list', {'data': {'recipe_ids': selected}}, 4),
+        ("API recettes par lot", 'POST', '/api/recipes/batch', {'json': {'ids': batch}}, 5),
+    ]
+
+
+def revalidations(recipe_ids):
+    """(description, url, budget du 304)."""
+    return [
+        ("détail, revalidation", f'/recipe/{recipe_ids[0]}', 4),
+        ("API recette, revalidation", f'/api/recipe/{recipe_ids[0]}', 2),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        recipe_ids = seed()
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *rest: statements.append(statement))
+
+    client = app.test_client()
+    client.post('/login', data={'email': EMAIL, 'password': PASSWORD})
+
+    failures = []
+    for label, method, url, kwargs, budget in routes(recipe_ids):
+        statements.clear()
+        response = client.open(url, method=method, **(kwargs or {}))
+        count = len(statements)
+        ok = response.status_code == 200 and count <= budget
+        print(f"{'✅' if ok else '❌'} {label} : {count} requête(s), budget {budget}"
+              + ('' if response.status_code == 200 else f' (HTTP {response.status_code})'))
+        if not ok:
+            failures.append(label)
+            if args.verbose:
+                for statement in statements:
+                    print('    ' + ' '.join(statement.split())[:160])
+
+    for label, url, budget in revalidations(recipe_ids):
+        etag = client.get(url).headers.get('ETag')
+        statements.clear()
+        response = client.get(url, headers={'If-None-Match': etag or ''})
+        count = len(statements)
+        ok = response.status_code == 304 and count <= budget
+        print(f"{'✅' if ok else '❌'} {label} : {count} requête(s), budget {budget}"
+              + ('' if response.status_code == 304 else f' (HTTP {response.status_code})'))
+        if not ok:
+            failures.append(label)
+            if args.verbose:
+                for statement in statements:
+                    print('    ' + ' '.join(statement.split())[:160])
+
+    if failures:
+        print(f"\n❌ {len(failures)} route(s) hors budget.")
+        return 1
+    print("\n✅ Toutes les routes respectent leur budget.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Matcher CIQUAL d'origine (find_best_ciqual_match, avant l'index en mémoire),
+rejoué sur une liste d'aliments au lieu de la base.
+
+Sert de référence à bench_matching.py : les moteurs de l'application doivent
+choisir le même aliment que lui. Le filtre SQL ILIKE '%mot%' devient une
+recherche de sous-chaîne sur le nom en minuscules, dans l'ordre des ids.
+"""
+import re
+
+# Copies figées du module d'origine : ne pas les remplacer par celles de
+# app/utils/ciqual_matching.py, qui peuvent évoluer
+EXCLUDED_KEYWORDS = ['préemballé', 'tartinade', 'sauce', 'plat cuisiné',
+                     'conserve', 'surgelé', 'pané', 'nappage', 'chips',
+                     'glace', 'gâteau', 'cake', 'biscuit', 'tzatziki']
+
+
+def singularize_fr(word):
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_words(text):
+    words = re.findall(r"[a-zàâäéèêëïîôöùûüç']+", text.lower())
+    return [singularize_fr(w) for w in words if len(w) > 2]
+
+
+def words_match(search_word, food_word):
+    if search_word == food_word:
+        return True
+    min_len = min(len(search_word), len(food_word))
+    if min_len < 4:
+        return False
+    prefix_len = min(min_len, 5)
+    return search_word[:prefix_len] == food_word[:prefix_len]
+
+
+class ReferenceMatcher:
+    """find() comme CiqualIndex.find(), sur des lignes (id, nom, ...)."""
+
+    def __init__(self, rows):
+        self.foods = sorted((row[0], row[1]) for row in rows)
+        self.lower_names = [name.lower() for _, name in self.foods]
+        self.food_words = [normalize_words(name) for _, name in self.foods]
+
+    def find(self, ingredient_name):
+        name_clean = ingredient_name.strip()
+        for (_, name), lower in zip(self.foods, self.lower_names):
+            if lower == name_clean.lower():
+                return name
+
+        search_words = normalize_words(name_clean)
+        if not search_words:
+            return None
+        candidates = [i for i, lower in enumerate(self.lower_names) if search_words[0] in lower]
+        if not candidates:
+            return None
+
+        def score(i):
+            name = self.foods[i][1]
+            matched = sum(1 for sw in search_words
+                          if any(words_match(sw, fw) for fw in self.food_words[i]))
+            transform_penalty = -10 if any(kw in name.lower() for kw in EXCLUDED_KEYWORDS) else 0
+            return (round(matched / len(search_words), 3), transform_penalty, -len(name))
+
+        best = max(candidates, key=score)
+        return self.foods[best][1] if score(best)[0] > 0 else None
@@ -31,6 +31,27 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+    # --- CIQUAL ---
+    # Délai (s) entre deux vérifications de la version du jeu CIQUAL
+    # par l'index en mémoire de chaque worker
+    CIQUAL_INDEX_TTL = int(os.environ.get('CIQUAL_INDEX_TTL', 60))
+    # Moteur de score des candidats : 'python' ou 'numpy' (vectorisé)
+    CIQUAL_MATCHER = os.environ.get('CIQUAL_MATCHER', 'python')
+    # Taille du cache LRU local devant la table ingredient_matches
+    CIQUAL_MATCH_CACHE_SIZE = int(os.environ.get('CIQUAL_MATCH_CACHE_SIZE', 2048))
+    # Fichier colonnaire partagé en mmap (flask ciqual build-store)
+    CIQUAL_STORE_PATH = os.environ.get('CIQUAL_STORE_PATH') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ciqual.bin')
+
+    # --- INDEX ---
+    # Durée (s) de vie des compteurs de filtres en mémoire d'un worker ;
+    # le worker qui modifie une recette les invalide aussitôt
+    FACET_CACHE_TTL = int(os.environ.get('FACET_CACHE_TTL', 300))
+
+    # --- JSON ---
+    # Encodeur de jsonify et des exports : 'orjson' (si installé) ou 'json'
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'orjson')
+
     # --- EMAIL ---
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
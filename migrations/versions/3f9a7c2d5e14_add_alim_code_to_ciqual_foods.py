@@ -0,0 +1,51 @@
+"""add alim_code to ciqual_foods
+
+Revision ID: 3f9a7c2d5e14
+Revises: 8b3c6f1e2a90
+Create Date: 2026-10-16 14:05:21.907311
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a7c2d5e14'
+down_revision = '8b3c6f1e2a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ciqual_foods', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('alim_code', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_ciqual_foods_alim_code'), ['alim_code'], unique=True)
+
+    # Retrouve le code CIQUAL des aliments déjà chargés (les noms sont uniques
+    # dans le fichier ; l'ancien seeder des outils les stockait en minuscules)
+    from app.utils.ciqual_data import CIQUAL_CSV_PATH, iter_ciqual_foods
+    if not os.path.exists(CIQUAL_CSV_PATH):
+        return
+    codes = {name.lower(): code for code, name, _ in iter_ciqual_foods()}
+
+    bind = op.get_bind()
+    foods = sa.table('ciqual_foods', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                     sa.column('alim_code', sa.Integer))
+    seen, updates = set(), []
+    for food_id, name in bind.execute(sa.select(foods.c.id, foods.c.name).order_by(foods.c.id)):
+        code = codes.get(name.lower())
+        if code is not None and code not in seen:
+            seen.add(code)
+            updates.append({'food_id': food_id, 'alim_code': code})
+    if updates:
+        bind.execute(
+            foods.update().where(foods.c.id == sa.bindparam('food_id')),
+            updates
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('ciqual_foods', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ciqual_foods_alim_code'))
+        batch_op.drop_column('alim_code')
@@ -0,0 +1,40 @@
+"""precompute normalized tokens on ciqual_foods
+
+Revision ID: 5d2e8a41c7f3
+Revises: 9c4e2b7d1f60
+Create Date: 2026-10-16 09:12:44.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8a41c7f3'
+down_revision = '9c4e2b7d1f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ciqual_foods', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tokens', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('is_transformed', sa.Boolean(), nullable=True))
+
+    # Remplit les colonnes pour les aliments déjà chargés
+    from app.utils.ciqual_matching import precompute_food_fields
+    bind = op.get_bind()
+    foods = sa.table('ciqual_foods', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                     sa.column('tokens', sa.Text), sa.column('is_transformed', sa.Boolean))
+    rows = bind.execute(sa.select(foods.c.id, foods.c.name)).fetchall()
+    if rows:
+        bind.execute(
+            foods.update().where(foods.c.id == sa.bindparam('food_id')),
+            [{'food_id': food_id, **precompute_food_fields(name)} for food_id, name in rows]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('ciqual_foods', schema=None) as batch_op:
+        batch_op.drop_column('is_transformed')
+        batch_op.drop_column('tokens')
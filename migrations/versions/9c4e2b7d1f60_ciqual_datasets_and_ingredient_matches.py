@@ -0,0 +1,46 @@
+"""ciqual datasets and ingredient matches cache
+
+Revision ID: 9c4e2b7d1f60
+Revises: bcdf0b2f0aec
+Create Date: 2026-10-16 08:47:12.604519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2b7d1f60'
+down_revision = 'bcdf0b2f0aec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ciqual_datasets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('food_count', sa.Integer(), nullable=False),
+    sa.Column('loaded_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('ingredient_matches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name_key', sa.String(length=200), nullable=False),
+    sa.Column('dataset_version', sa.Integer(), nullable=True),
+    sa.Column('ciqual_food_id', sa.Integer(), nullable=True),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('reason', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name_key', 'dataset_version', name='uq_ingredient_matches_key_version')
+    )
+    with op.batch_alter_table('ingredient_matches', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ingredient_matches_name_key'), ['name_key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ingredient_matches', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingredient_matches_name_key'))
+
+    op.drop_table('ingredient_matches')
+    op.drop_table('ciqual_datasets')
@@ -0,0 +1,79 @@
+"""recipe full text search
+
+Revision ID: a6d41e9b7c35
+Revises: 3f9a7c2d5e14
+Create Date: 2026-10-16 16:48:03.512944
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d41e9b7c35'
+down_revision = '3f9a7c2d5e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.utils.recipe_search import PG_SEARCH_DDL, SQLITE_SEARCH_DDL, build_search_document
+
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('search_document', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    for statement in {'postgresql': PG_SEARCH_DDL, 'sqlite': SQLITE_SEARCH_DDL}.get(dialect, ()):
+        op.execute(statement)
+
+    # Remplit le texte indexé des recettes existantes
+    recipes = sa.table('recipes', sa.column('id', sa.Integer), sa.column('title', sa.String),
+                       sa.column('description', sa.Text), sa.column('tips', sa.Text),
+                       sa.column('search_document', sa.Text))
+    ingredients = sa.table('ingredients', sa.column('recipe_id', sa.Integer), sa.column('name', sa.String))
+    steps = sa.table('steps', sa.column('recipe_id', sa.Integer), sa.column('order', sa.Integer),
+                     sa.column('instruction', sa.Text))
+    tags = sa.table('tags', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    recipe_tags = sa.table('recipe_tags', sa.column('recipe_id', sa.Integer), sa.column('tag_id', sa.Integer))
+
+    children = {}
+    for key, stmt in (
+        ('ingredients', sa.select(ingredients.c.recipe_id, ingredients.c.name)),
+        ('steps', sa.select(steps.c.recipe_id, steps.c.instruction).order_by(steps.c.order)),
+        ('tags', sa.select(recipe_tags.c.recipe_id, tags.c.name)
+                   .join(tags, tags.c.id == recipe_tags.c.tag_id)),
+    ):
+        for recipe_id, value in bind.execute(stmt):
+            children.setdefault((key, recipe_id), []).append(value)
+
+    updates, fts_rows = [], []
+    for recipe_id, title, description, tips in bind.execute(
+            sa.select(recipes.c.id, recipes.c.title, recipes.c.description, recipes.c.tips)):
+        document = build_search_document(
+            description, tips, children.get(('ingredients', recipe_id), []),
+            children.get(('steps', recipe_id), []), children.get(('tags', recipe_id), []))
+        updates.append({'recipe_id': recipe_id, 'search_document': document})
+        fts_rows.append({'rowid': recipe_id, 'title': title, 'body': document})
+    if updates:
+        bind.execute(
+            recipes.update().where(recipes.c.id == sa.bindparam('recipe_id')),
+            updates
+        )
+    if fts_rows and dialect == 'sqlite':
+        bind.execute(sa.text("DELETE FROM recipes_fts"))
+        bind.execute(sa.text("INSERT INTO recipes_fts (rowid, title, body) VALUES (:rowid, :title, :body)"),
+                     fts_rows)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_recipes_search_vector")
+        op.execute("ALTER TABLE recipes DROP COLUMN IF EXISTS search_vector")
+        op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS recipes_fts")
+
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.drop_column('search_document')
@@ -0,0 +1,100 @@
+"""per user composite indexes
+
+Revision ID: c2e8f4a91b67
+Revises: a6d41e9b7c35
+Create Date: 2026-10-16 18:21:37.640218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e8f4a91b67'
+down_revision = 'a6d41e9b7c35'
+branch_labels = None
+depends_on = None
+
+
+def _duplicates(bind, table):
+    """{id en double: id conservé} pour les (user_id, name) répétés, le plus ancien gagnant."""
+    kept, duplicates = {}, {}
+    for row_id, user_id, name in bind.execute(
+            sa.select(table.c.id, table.c.user_id, table.c.name).order_by(table.c.id)):
+        key = (user_id, name)
+        if key in kept:
+            duplicates[row_id] = kept[key]
+        else:
+            kept[key] = row_id
+    return duplicates
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Les routes supposent déjà un seul tag / une seule catégorie par nom et
+    # par utilisateur : on fusionne les éventuels doublons avant les contraintes
+    tags = sa.table('tags', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                    sa.column('name', sa.String))
+    recipe_tags = sa.table('recipe_tags', sa.column('recipe_id', sa.Integer), sa.column('tag_id', sa.Integer))
+    for duplicate_id, kept_id in _duplicates(bind, tags).items():
+        already_tagged = sa.select(recipe_tags.c.recipe_id).where(recipe_tags.c.tag_id == kept_id)
+        bind.execute(recipe_tags.delete().where(recipe_tags.c.tag_id == duplicate_id,
+                                                recipe_tags.c.recipe_id.in_(already_tagged)))
+        bind.execute(recipe_tags.update().where(recipe_tags.c.tag_id == duplicate_id)
+                     .values(tag_id=kept_id))
+        bind.execute(tags.delete().where(tags.c.id == duplicate_id))
+
+    categories = sa.table('categories', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                          sa.column('name', sa.String))
+    duplicate_categories = list(_duplicates(bind, categories))
+    if duplicate_categories:
+        bind.execute(categories.delete().where(categories.c.id.in_(duplicate_categories)))
+
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.create_index('ix_recipes_user_created', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_recipes_user_title', ['user_id', 'title', 'id'], unique=False)
+
+    with op.batch_alter_table('ingredients', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ingredients_recipe_id'), ['recipe_id'], unique=False)
+
+    with op.batch_alter_table('steps', schema=None) as batch_op:
+        batch_op.create_index('ix_steps_recipe_order', ['recipe_id', 'order'], unique=False)
+
+    with op.batch_alter_table('recipe_tags', schema=None) as batch_op:
+        batch_op.create_index('ix_recipe_tags_tag_id', ['tag_id'], unique=False)
+
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_tags_user_name', ['user_id', 'name'])
+
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_categories_user_name', ['user_id', 'name'])
+
+    with op.batch_alter_table('cooking_history', schema=None) as batch_op:
+        batch_op.create_index('ix_cooking_history_user_cooked', ['user_id', 'cooked_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_cooking_history_recipe_id'), ['recipe_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cooking_history', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cooking_history_recipe_id'))
+        batch_op.drop_index('ix_cooking_history_user_cooked')
+
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_categories_user_name', type_='unique')
+
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_tags_user_name', type_='unique')
+
+    with op.batch_alter_table('recipe_tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipe_tags_tag_id')
+
+    with op.batch_alter_table('steps', schema=None) as batch_op:
+        batch_op.drop_index('ix_steps_recipe_order')
+
+    with op.batch_alter_table('ingredients', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingredients_recipe_id'))
+
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipes_user_title')
+        batch_op.drop_index('ix_recipes_user_created')
@@ -0,0 +1,38 @@
+"""computed total time and carbs per serving
+
+Revision ID: d7b1a4c39e52
+Revises: c2e8f4a91b67
+Create Date: 2026-10-16 19:05:12.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b1a4c39e52'
+down_revision = 'c2e8f4a91b67'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite n'ajoute pas de colonne générée STORED par ALTER TABLE : on
+    # reconstruit la table, les valeurs étant calculées à la recopie
+    with op.batch_alter_table('recipes', schema=None, recreate='auto') as batch_op:
+        batch_op.add_column(sa.Column('total_time', sa.Integer(), sa.Computed(
+            'coalesce(prep_time, 0) + coalesce(cook_time, 0)', persisted=True), nullable=True))
+        batch_op.add_column(sa.Column('carbs_per_serving', sa.Float(), sa.Computed(
+            'CASE WHEN servings > 0 THEN coalesce(total_carbs, 0) / servings ELSE 0 END',
+            persisted=True), nullable=True))
+        batch_op.create_index('ix_recipes_user_total_time', ['user_id', 'total_time', 'id'], unique=False)
+        batch_op.create_index('ix_recipes_user_carbs_per_serving',
+                              ['user_id', 'carbs_per_serving', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipes_user_carbs_per_serving')
+        batch_op.drop_index('ix_recipes_user_total_time')
+        batch_op.drop_column('carbs_per_serving')
+        batch_op.drop_column('total_time')